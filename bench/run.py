@@ -0,0 +1,293 @@
+# Load benchmark for the backend against local upstream stubs, so runs cost
+# no API quota and are repeatable:
+#
+#   python bench/run.py --scenario itinerary=1,city-search=4 --concurrency 16 --duration 30
+#
+# Starts bench/stubs.py with a latency profile, launches travel_itinerary1
+# under gunicorn pointed at the stubs (or uses --backend), drives the chosen
+# routes from --concurrency threads and prints throughput and latency
+# percentiles per route. --json saves the report; --baseline compares it with
+# an earlier one and exits 1 when p95 or throughput regress beyond --tolerance.
+from collections import Counter
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+CITIES = [c["name"] for c in json.load(open(os.path.join(BENCH_DIR, "fixtures", "openweather_geo.json"), encoding="utf-8"))]
+BUDGETS = ["Economy", "Standard", "Luxury"]
+INTERESTS = ["Food", "Adventure", "Culture", "Nature", "Shopping", "History", "Relaxation"]
+
+
+def itinerary_body(rng):
+    return {
+        "city": rng.choice(CITIES),
+        "days": rng.randint(1, 7),
+        "budget": rng.choice(BUDGETS),
+        "interests": rng.sample(INTERESTS, rng.randint(1, 3)),
+    }
+
+
+def run_itinerary(session, base_url, rng):
+    r = session.post(f"{base_url}/itinerary", json=itinerary_body(rng), timeout=120)
+    return r.status_code, r.status_code == 200 and "itinerary" in r.json()
+
+
+def run_stream(session, base_url, rng):
+    with session.post(f"{base_url}/itinerary/stream", json=itinerary_body(rng), stream=True, timeout=120) as r:
+        last = None
+        for line in r.iter_lines():
+            if line:
+                last = json.loads(line)
+    return r.status_code, r.status_code == 200 and (last or {}).get("event") == "done"
+
+
+def run_city_search(session, base_url, rng):
+    city = rng.choice(CITIES)
+    r = session.get(f"{base_url}/city-search", params={"q": city[:rng.randint(2, len(city))]}, timeout=30)
+    return r.status_code, r.status_code == 200
+
+
+SCENARIOS = {
+    "itinerary": run_itinerary,
+    "stream": run_stream,
+    "city-search": run_city_search,
+}
+
+
+def parse_mix(text):
+    # "itinerary=1,city-search=4" -> [("itinerary", 1.0), ("city-search", 4.0)]
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = Counter()
+        self.statuses = {}
+
+    def record(self, name, seconds, status, ok):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            self.statuses.setdefault(name, Counter())[str(status)] += 1
+            if not ok:
+                self.errors[name] += 1
+
+    def report(self, elapsed):
+        output = {}
+        for name, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            output[name] = {
+                "requests": len(values),
+                "errors": self.errors[name],
+                "throughput_rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1),
+                "statuses": dict(self.statuses[name]),
+            }
+        return output
+
+
+def drive(base_url, mix, concurrency, duration, seed, recorder=None):
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    stop_at = time.monotonic() + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        while time.monotonic() < stop_at:
+            name = rng.choices(names, weights)[0]
+            started = time.monotonic()
+            try:
+                status, ok = SCENARIOS[name](session, base_url, rng)
+            except (requests.RequestException, ValueError):
+                status, ok = "exception", False
+            if recorder is not None:
+                recorder.record(name, time.monotonic() - started, status, ok)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.monotonic() - started
+
+
+def start_stubs(profile, port):
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "stubs.py"), "--profile", profile, "--port", str(port)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    env = {}
+    while len(env) < 4:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError("stub servers exited before starting")
+        key, _, value = line.strip().partition("=")
+        env[key] = value
+    return proc, env
+
+
+def start_backend(port, workers, threads, upstream_env, cache, rate_limits):
+    env = dict(os.environ)
+    env.update(upstream_env)
+    env.update({
+        "OPENWEATHER_API_KEY": "bench",
+        "GEOAPIFY_API_KEY": "bench",
+        "SPOONACULAR_API_KEY": "bench",
+        "CACHE_ENABLED": "true" if cache else "false",
+        "CACHE_DB_PATH": "",
+        "IMAGE_CACHE_DIR": "",
+        "GAZETTEER_PATH": "",
+        "POI_GEOJSON_PATH": "",
+    })
+    if not rate_limits:
+        # The real providers' quotas would throttle the run within seconds.
+        for name in ("OPENWEATHER", "GEOAPIFY", "SPOONACULAR"):
+            env[f"{name}_RATE_PER_SECOND"] = "0"
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn",
+            "--chdir", REPO_DIR,
+            "--bind", f"127.0.0.1:{port}",
+            "--workers", str(workers),
+            "--threads", str(threads),
+            "--timeout", "120",
+            "--log-level", "warning",
+            "travel_itinerary1:app",
+        ],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {proc.returncode}")
+        try:
+            if requests.get(f"{base_url}/health", timeout=2).status_code == 200:
+                return proc, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError("backend did not become healthy within 30s")
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} rps")
+    return regressions
+
+
+def print_report(report):
+    print(f"{'scenario':<14}{'requests':>10}{'errors':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)")
+    for name, row in report["scenarios"].items():
+        print(
+            f"{name:<14}{row['requests']:>10}{row['errors']:>8}{row['throughput_rps']:>9}"
+            f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the travel planner backend against local upstream stubs.")
+    parser.add_argument("--scenario", type=parse_mix, default=parse_mix("itinerary"),
+                        help="weighted mix of itinerary, stream and city-search, e.g. itinerary=1,city-search=4")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before the run")
+    parser.add_argument("--profile", default=os.path.join(BENCH_DIR, "profiles", "default.json"))
+    parser.add_argument("--stub-port", type=int, default=18100)
+    parser.add_argument("--port", type=int, default=18000, help="port for the gunicorn backend")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--cache", action="store_true", help="keep the backend response caches on (off measures every call)")
+    parser.add_argument("--rate-limits", action="store_true", help="keep the backend's per-provider rate limits on")
+    parser.add_argument("--backend", help="benchmark an already running backend at this URL instead")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="earlier --json report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative p95/throughput change")
+    args = parser.parse_args()
+
+    procs = []
+    try:
+        base_url = args.backend
+        if not base_url:
+            stubs, upstream_env = start_stubs(args.profile, args.stub_port)
+            procs.append(stubs)
+            backend, base_url = start_backend(args.port, args.workers, args.threads, upstream_env, args.cache, args.rate_limits)
+            procs.append(backend)
+
+        if args.warmup > 0:
+            drive(base_url, args.scenario, args.concurrency, args.warmup, args.seed + 10000)
+        recorder = Recorder()
+        elapsed = drive(base_url, args.scenario, args.concurrency, args.duration, args.seed, recorder)
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    report = {
+        "config": {
+            "scenario": dict(args.scenario),
+            "concurrency": args.concurrency,
+            "duration_s": round(elapsed, 2),
+            "profile": os.path.basename(args.profile),
+            "workers": args.workers,
+            "threads": args.threads,
+            "cache": args.cache,
+            "rate_limits": args.rate_limits,
+            "backend": args.backend or "gunicorn",
+        },
+        "scenarios": recorder.report(elapsed),
+    }
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
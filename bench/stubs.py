@@ -0,0 +1,192 @@
+# Local stand-ins for OpenWeather, Geoapify, Spoonacular and Wikipedia, one
+# HTTP server per provider, answering from the recorded payloads in fixtures/
+# after a log-normal delay. Profiles (profiles/*.json) set each provider's
+# median latency, spread and share of 5xx / 429 answers.
+#
+#   python bench/stubs.py --profile bench/profiles/default.json --port 18100
+#
+# prints one "<ENV_VAR>=<base url>" line per server (the variables
+# travel_itinerary1 reads its upstream base URLs from), then serves until killed.
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# Providers sharing a base URL in travel_itinerary1 share a server.
+BASE_URL_ENV = {
+    "openweather": "OPENWEATHER_BASE_URL",
+    "geoapify": "GEOAPIFY_BASE_URL",
+    "spoonacular": "SPOONACULAR_BASE_URL",
+    "wikipedia": "WIKIPEDIA_BASE_URL",
+}
+ROUTES = {
+    "/geo/1.0/direct": "openweather_geo",
+    "/data/2.5/weather": "openweather_weather",
+    "/v2/places": "geoapify",
+    "/recipes/complexSearch": "spoonacular",
+    "/w/api.php": "wikipedia",
+}
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+GEO_CITIES = load_fixture("openweather_geo.json")
+WEATHER = load_fixture("openweather_weather.json")
+PLACES = load_fixture("geoapify_places.json")["features"]
+RECIPES = load_fixture("spoonacular_search.json")
+WIKI_PAGE = load_fixture("wikipedia_page.json")
+
+
+def answer_geo(args):
+    query = args.get("q", "").split(",")[0].strip().lower()
+    limit = int(args.get("limit", 5))
+    matches = [c for c in GEO_CITIES if c["name"].lower().startswith(query)]
+    return matches[:limit]
+
+
+def answer_weather(args):
+    body = dict(WEATHER)
+    if "lat" in args:
+        body["coord"] = {"lat": float(args["lat"]), "lon": float(args["lon"])}
+    return body
+
+
+def _in_categories(categories, wanted):
+    return any(c == w or c.startswith(w + ".") for c in categories for w in wanted)
+
+
+def answer_places(args):
+    # Fixture coordinates are offsets from the requested circle's centre.
+    lon, lat, _ = (float(x) for x in args.get("filter", "circle:0,0,0").split(":", 1)[1].split(","))
+    wanted = [c for c in args.get("categories", "").split(",") if c]
+    limit = int(args.get("limit", 20))
+    features = []
+    for feature in PLACES:
+        props = feature["properties"]
+        if wanted and not _in_categories(props["categories"], wanted):
+            continue
+        dlon, dlat = feature["geometry"]["coordinates"]
+        point = [round(lon + dlon, 7), round(lat + dlat, 7)]
+        features.append({
+            "type": "Feature",
+            "properties": dict(props, lon=point[0], lat=point[1]),
+            "geometry": {"type": "Point", "coordinates": point},
+        })
+    features.sort(key=lambda f: f["properties"]["distance"])
+    return {"type": "FeatureCollection", "features": features[:limit]}
+
+
+def answer_recipes(args):
+    number = int(args.get("number", 8))
+    return dict(RECIPES, results=RECIPES["results"][:number], number=number)
+
+
+def _wiki_page(title, page_id):
+    thumb = dict(WIKI_PAGE["thumbnail"])
+    thumb["source"] = thumb["source"].replace("Paris", title.replace(" ", "_"))
+    return dict(WIKI_PAGE, pageid=page_id, title=title, thumbnail=thumb)
+
+
+def answer_wikipedia(args):
+    if "titles" in args:
+        titles = [t for t in args["titles"].split("|") if t]
+        pages = {str(1000 + i): _wiki_page(t, 1000 + i) for i, t in enumerate(titles)}
+        return {"batchcomplete": "", "query": {"pages": pages}}
+    query = args.get("gsrsearch", "Paris")
+    return {"batchcomplete": "", "query": {"pages": {"999": _wiki_page(query, 999)}}}
+
+
+ANSWERS = {
+    "openweather_geo": answer_geo,
+    "openweather_weather": answer_weather,
+    "geoapify": answer_places,
+    "spoonacular": answer_recipes,
+    "wikipedia": answer_wikipedia,
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    profile = {}
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        provider = ROUTES.get(parts.path)
+        if provider is None:
+            return self._send(404, {"error": "unknown path"})
+        settings = self.profile.get(provider, {})
+        median = settings.get("median_ms", 100) / 1000
+        time.sleep(median * math.exp(settings.get("sigma", 0.0) * random.gauss(0, 1)))
+
+        roll = random.random()
+        if roll < settings.get("error_rate", 0.0):
+            return self._send(503, {"error": "stub outage"})
+        if roll < settings.get("error_rate", 0.0) + settings.get("throttle_rate", 0.0):
+            return self._send(429, {"error": "stub rate limit"}, {"Retry-After": "1"})
+        args = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self._send(200, ANSWERS[provider](args))
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The backend gave up on this call (deadline or timeout).
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stubs(profile, host="127.0.0.1", port=0):
+    # Returns ({env var: base url}, servers). port=0 picks free ports;
+    # otherwise servers take port, port + 1, ...
+    handler = type("ProfiledStubHandler", (StubHandler,), {"profile": profile})
+    env = {}
+    servers = []
+    for i, (name, env_var) in enumerate(BASE_URL_ENV.items()):
+        server = ThreadingHTTPServer((host, port + i if port else 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name=f"stub-{name}", daemon=True).start()
+        env[env_var] = f"http://{host}:{server.server_address[1]}"
+        servers.append(server)
+    return env, servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve stub upstream APIs for benchmarks.")
+    parser.add_argument("--profile", default=os.path.join(os.path.dirname(FIXTURES_DIR), "profiles", "default.json"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18100)
+    args = parser.parse_args()
+
+    with open(args.profile, encoding="utf-8") as f:
+        profile = json.load(f)
+    env, _ = start_stubs(profile, args.host, args.port)
+    for env_var, url in env.items():
+        print(f"{env_var}={url}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
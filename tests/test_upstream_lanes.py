@@ -0,0 +1,58 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+os.environ.setdefault("CACHE_ENABLED", "false")
+os.environ.setdefault("CACHE_DB_PATH", "")
+os.environ.setdefault("GAZETTEER_PATH", "")
+os.environ.setdefault("POI_GEOJSON_PATH", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import travel_itinerary1 as app_module  # noqa: E402
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def json(self):
+        return {"results": [{"title": "Pasta"}]}
+
+
+class InteractiveLaneTest(unittest.TestCase):
+    def test_interactive_call_does_not_follow_queued_batch_leader(self):
+        # Tokens for one interactive call, not for batch (which keeps half the
+        # burst in reserve), so the batch leader waits in the bucket.
+        limiter = app_module.TokenBucket("spoonacular", rate=0.5, burst=4, daily_quota=0)
+        limiter._tokens = 1.5
+        params = {"query": "Paris local cuisine", "number": 8}
+        batch_started = threading.Event()
+
+        def batch_call():
+            with app_module.batch_lane():
+                batch_started.set()
+                app_module.safe_get_json(app_module.SPOONACULAR_SEARCH_URL, params=params)
+
+        with mock.patch.dict(app_module.rate_limiters, {"spoonacular": limiter}), \
+                mock.patch.object(app_module.upstream_session, "get", return_value=FakeResponse()):
+            batch = threading.Thread(target=batch_call)
+            batch.start()
+            batch_started.wait()
+            time.sleep(0.1)
+
+            started = time.monotonic()
+            with app_module.request_budget(8) as budget:
+                data = app_module.safe_get_json(app_module.SPOONACULAR_SEARCH_URL, params=params)
+            elapsed = time.monotonic() - started
+            batch.join()
+
+        self.assertEqual(data, FakeResponse().json())
+        self.assertLess(elapsed, 1.0)
+        self.assertNotIn("spoonacular", budget.degraded_providers)
+
+
+if __name__ == "__main__":
+    unittest.main()
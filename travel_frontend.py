@@ -1,12 +1,18 @@
 ﻿import streamlit as st
 import requests
 import datetime
+import json
+import time
+from collections import OrderedDict
 from urllib.parse import quote_plus
 
 API_URL = "https://ai-powered-travel-planner-g8j3.onrender.com/itinerary"
+STREAM_URL = "https://ai-powered-travel-planner-g8j3.onrender.com/itinerary/stream"
 CITY_SEARCH_URL = "https://ai-powered-travel-planner-g8j3.onrender.com/city-search"
 
 ITINERARY_TIMEOUT_SECONDS = 90
+ITINERARY_CACHE_TTL_SECONDS = 900
+ITINERARY_CACHE_MAX_ENTRIES = 32
 
 @st.cache_data(ttl=300, show_spinner=False)
 def fetch_city_matches(query, limit=8):
@@ -22,6 +28,362 @@ def fetch_city_matches(query, limit=8):
         return None
     return []
 
+def open_itinerary_stream(payload):
+    # Returns (status_code, events). Each event is {"event": ..., "data": {...}}
+    # where data is a partial itinerary response; merging them in order gives
+    # the same document /itinerary returns.
+    response = requests.post(STREAM_URL, json=payload, stream=True, timeout=ITINERARY_TIMEOUT_SECONDS)
+    if response.status_code in (404, 405):
+        # Backend without the streaming route: fall back to one blocking call.
+        response.close()
+        response = requests.post(API_URL, json=payload, timeout=ITINERARY_TIMEOUT_SECONDS)
+        if response.status_code != 200:
+            return response.status_code, iter(())
+        return 200, iter([{"event": "complete", "data": response.json()}, {"event": "done"}])
+    if response.status_code != 200:
+        response.close()
+        return response.status_code, iter(())
+    return 200, _iter_ndjson(response)
+
+def _iter_ndjson(response):
+    with response:
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+def _itinerary_cache():
+    # Finished itineraries of this session: key -> (expires_at, events),
+    # least recently used first.
+    if 'itinerary_cache' not in st.session_state:
+        st.session_state.itinerary_cache = OrderedDict()
+    return st.session_state.itinerary_cache
+
+def cached_itinerary(key):
+    cache = _itinerary_cache()
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    if entry[0] <= time.monotonic():
+        del cache[key]
+        return None
+    cache.move_to_end(key)
+    return entry[1]
+
+def store_itinerary(key, events):
+    cache = _itinerary_cache()
+    cache[key] = (time.monotonic() + ITINERARY_CACHE_TTL_SECONDS, events)
+    cache.move_to_end(key)
+    while len(cache) > ITINERARY_CACHE_MAX_ENTRIES:
+        cache.popitem(last=False)
+
+def fetch_itinerary_events(destination, days, budget, interests, debug=False):
+    # Reruns (slider moves, tab switches) replay a finished itinerary from
+    # the cache instead of asking the backend to build it again. Debug runs
+    # ask for fresh backend timings, so they skip the cache.
+    key = (destination.strip().lower(), int(days), budget, tuple(sorted(interests or [])))
+    if not debug:
+        events = cached_itinerary(key)
+        if events is not None:
+            return 200, iter(events)
+    payload = {
+        "city": destination,
+        "days": days,
+        "budget": budget,
+        "interests": interests
+    }
+    if debug:
+        payload["debug"] = True
+    status_code, events = open_itinerary_stream(payload)
+    if status_code != 200 or debug:
+        return status_code, events
+    return 200, _record_itinerary(key, events)
+
+def _record_itinerary(key, events):
+    recorded = []
+    for event in events:
+        recorded.append(event)
+        kind = event.get("event")
+        if kind == "error":
+            yield event
+            return
+        # Store before handing over "done": the caller stops reading there.
+        # Itineraries with degraded sections are not kept so a retry can do better.
+        if kind == "done" and not any((e.get("data") or {}).get("degraded") for e in recorded):
+            store_itinerary(key, recorded)
+        yield event
+
+def render_trip_header(display_destination, days, start_date):
+    st.markdown(
+        f"""
+        <div class="trip-header">
+            <h1 style="color: #ffffff; -webkit-text-fill-color: #ffffff; background: none; -webkit-background-clip: initial; font-size: 42px; font-weight: 700; text-shadow: 0 4px 12px rgba(0, 0, 0, 0.35);">
+                🧳 Your {days}-Day Travel Plan to {display_destination}
+            </h1>
+            <p style="color: #ffffff; font-size: 18px; text-shadow: 0 2px 6px rgba(0, 0, 0, 0.3);">
+                {start_date.strftime('%B %d, %Y')} → {(start_date + datetime.timedelta(days=days - 1)).strftime('%B %d, %Y')}
+            </p>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+def render_weather(weather, display_destination):
+    temp = weather.get('temperature', 25)
+    conditions = weather.get('conditions', 'Sunny')
+    humidity = weather.get('humidity', 60)
+
+    st.markdown(f"""
+    <div class="weather-card">
+        <div style="display: flex; align-items: center; justify-content: space-between;">
+            <div>
+                <h2 style="margin: 0; color: white; font-size: 28px;">🌡️ Weather in {display_destination}</h2>
+                <p style="margin: 10px 0 0 0; opacity: 0.9; font-size: 16px;">{conditions}</p>
+            </div>
+            <div style="text-align: right;">
+                <div style="color: white; font-size: 56px; line-height: 1; font-weight: 700;">{temp}°C</div>
+                <p style="margin: 5px 0 0 0; opacity: 0.9;">Humidity: {humidity}%</p>
+            </div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+def render_description(description, display_destination):
+    st.markdown(f"""
+    <div class="card" style="border-left-color: #667eea;">
+        <div style="display: flex; align-items: start;">
+            <div class="icon-wrapper">📌</div>
+            <div style="flex: 1;">
+                <h3 style="margin: 0 0 12px 0; color: #1f2937;">About {display_destination}</h3>
+                <p style="color: #4b5563; line-height: 1.8; margin: 0;">{description or f'{display_destination} is a beautiful destination with rich culture and history.'}</p>
+            </div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+def render_day_plans(itinerary, start_date):
+    st.markdown('<h2 style="margin-top: 40px; margin-bottom: 20px;">📅 Day-by-Day Itinerary</h2>', unsafe_allow_html=True)
+
+    for day_plan in itinerary:
+        day_num = day_plan.get('day', 1)
+        current_date = start_date + datetime.timedelta(days=day_num-1)
+        
+        morning_text = day_plan.get('morning', 'Morning activity')
+        lunch_text = day_plan.get('lunch', 'Lunch recommendation')
+        afternoon_text = day_plan.get('afternoon', 'Afternoon activity')
+        evening_text = day_plan.get('evening', 'Evening activity')
+        
+        st.markdown(f"""
+        <div class="day-card">
+            <div style="display: flex; align-items: center; margin-bottom: 20px;">
+                <div class="icon-wrapper" style="background: linear-gradient(135deg, #10b981 0%, #059669 100%);">📅</div>
+                <div>
+                    <h3 style="margin: 0; color: #1f2937;">Day {day_num} - {current_date.strftime('%A, %B %d')}</h3>
+                </div>
+            </div>
+        """, unsafe_allow_html=True)
+        
+        # Morning activity
+        st.markdown(f"""
+            <div class="activity-row morning">
+                <span style="font-size: 24px; margin-right: 12px;">🕘</span>
+                <div>
+                    <strong style="color: #92400e; font-size: 14px; text-transform: uppercase;">Morning</strong>
+                    <p style="margin: 4px 0 0 0; color: #1f2937;">{morning_text}</p>
+                </div>
+            </div>
+        """, unsafe_allow_html=True)
+        
+        # Lunch activity
+        st.markdown(f"""
+            <div class="activity-row lunch">
+                <span style="font-size: 24px; margin-right: 12px;">🍴</span>
+                <div>
+                    <strong style="color: #991b1b; font-size: 14px; text-transform: uppercase;">Lunch</strong>
+                    <p style="margin: 4px 0 0 0; color: #1f2937;">{lunch_text}</p>
+                </div>
+            </div>
+        """, unsafe_allow_html=True)
+        
+        # Afternoon activity
+        st.markdown(f"""
+            <div class="activity-row afternoon">
+                <span style="font-size: 24px; margin-right: 12px;">🕒</span>
+                <div>
+                    <strong style="color: #1e40af; font-size: 14px; text-transform: uppercase;">Afternoon</strong>
+                    <p style="margin: 4px 0 0 0; color: #1f2937;">{afternoon_text}</p>
+                </div>
+            </div>
+        """, unsafe_allow_html=True)
+        
+        # Evening activity
+        st.markdown(f"""
+            <div class="activity-row evening">
+                <span style="font-size: 24px; margin-right: 12px;">🌆</span>
+                <div>
+                    <strong style="color: #6b21a8; font-size: 14px; text-transform: uppercase;">Evening</strong>
+                    <p style="margin: 4px 0 0 0; color: #1f2937;">{evening_text}</p>
+                </div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+def render_restaurants(restaurants, destination, display_destination):
+    if restaurants:
+        for i, restaurant in enumerate(restaurants[:8], 1):
+            name = restaurant.get('name', 'Restaurant')
+            address = restaurant.get('address', restaurant.get('address_line2', destination))
+            price_range = restaurant.get('price_range', '$$')
+            specialty = restaurant.get('specialty', 'Local cuisine')
+            rating = restaurant.get('rating', 4.0)
+            
+            st.markdown(f"""
+            <div class="card food-card">
+                <div style="display: flex; align-items: start; justify-content: space-between;">
+                    <div style="display: flex; align-items: start; flex: 1;">
+                        <div style="background: linear-gradient(135deg, #FF4B4B 0%, #dc2626 100%); color: white; width: 42px; height: 42px; border-radius: 10px; display: flex; align-items: center; justify-content: center; font-weight: 700; margin-right: 16px; box-shadow: 0 4px 12px rgba(255, 75, 75, 0.3);">{i}</div>
+                        <div style="flex: 1;">
+                            <h4 style="margin: 0 0 8px 0; color: #1f2937; font-size: 18px;">{name}</h4>
+                            <p style="margin: 6px 0; color: #6b7280; font-size: 14px;"><span style="margin-right: 8px;">📌</span>{address}</p>
+                            <div style="margin-top: 10px;">
+                                <span class="price-badge">{price_range}</span>
+                                <span style="color: #4b5563; font-size: 14px;">🍽️ {specialty}</span>
+                            </div>
+                        </div>
+                    </div>
+                    <div class="rating-badge">⭐ {rating}</div>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+    else:
+        st.info(f"🔍 Explore local restaurants in {display_destination} for authentic dining experiences.")
+
+def render_attractions(attractions, destination, display_destination):
+    if attractions:
+        for i, attraction in enumerate(attractions[:10], 1):
+            name = attraction.get('name', 'Attraction')
+            address = attraction.get('address_line2', attraction.get('formatted', destination))
+            category = attraction.get('categories', {}).get('name', 'Attraction')
+            
+            st.markdown(f"""
+            <div class="card landmark-card">
+                <div style="display: flex; align-items: start;">
+                    <div style="background: linear-gradient(135deg, #1C83E1 0%, #1e40af 100%); color: white; width: 42px; height: 42px; border-radius: 10px; display: flex; align-items: center; justify-content: center; font-weight: 700; margin-right: 16px; box-shadow: 0 4px 12px rgba(28, 131, 225, 0.3);">{i}</div>
+                    <div style="flex: 1;">
+                        <h4 style="margin: 0 0 8px 0; color: #1f2937; font-size: 18px;">{name}</h4>
+                        <p style="margin: 6px 0; color: #6b7280; font-size: 14px;"><span style="margin-right: 8px;">📌</span>{address}</p>
+                        <div style="margin-top: 10px;">
+                            <span style="background: linear-gradient(135deg, #dbeafe 0%, #bfdbfe 100%); color: #1e40af; padding: 4px 12px; border-radius: 12px; font-weight: 600; font-size: 13px;">🏷️ {category}</span>
+                        </div>
+                    </div>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+    else:
+        st.info(f"🔍 Discover amazing attractions and landmarks in {display_destination}.")
+
+def render_destination_image(location_images, display_destination):
+    try:
+        image_url = location_images[0] if location_images else "https://images.pexels.com/photos/346885/pexels-photo-346885.jpeg?auto=compress&cs=tinysrgb&w=1200"
+        
+        st.image(image_url, caption=f"🖼️ {display_destination}", use_container_width=True)
+    except:
+        # Fallback image
+        st.image("https://images.pexels.com/photos/3944104/pexels-photo-3944104.jpeg?auto=compress&cs=tinysrgb&w=800", 
+                caption=f"🖼️ {display_destination}", use_container_width=True)
+
+def render_trip_summary(display_destination, days, budget, interests, start_date):
+    st.markdown(f"""
+    <div class="summary-box">
+        <h3 style="margin: 0 0 20px 0; color: #1f2937; text-align: center;">📋 Trip Summary</h3>
+        <p><span style="font-size: 20px; margin-right: 8px;">📌</span><strong>Destination:</strong> {display_destination}</p>
+        <p><span style="font-size: 20px; margin-right: 8px;">📅</span><strong>Duration:</strong> {days} days</p>
+        <p><span style="font-size: 20px; margin-right: 8px;">💰</span><strong>Budget:</strong> {budget}</p>
+        <p><span style="font-size: 20px; margin-right: 8px;">🧩</span><strong>Interests:</strong> {', '.join(interests) if interests else 'Not specified'}</p>
+        <p><span style="font-size: 20px; margin-right: 8px;">📆</span><strong>Dates:</strong> {start_date.strftime('%b %d')} - {(start_date + datetime.timedelta(days=days-1)).strftime('%b %d, %Y')}</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+def render_specialties(specialties):
+    st.markdown('<h3 style="margin-top: 30px; margin-bottom: 15px; color: #1f2937;">🍴 Local Specialties</h3>', unsafe_allow_html=True)
+    specialty_html = '<div style="margin: 10px 0;">'
+    for food in specialties[:5]:
+        specialty_html += f'<span class="specialty-tag">🍽️ {food}</span>'
+    specialty_html += '</div>'
+    st.markdown(specialty_html, unsafe_allow_html=True)
+
+def render_landmarks(landmarks):
+    st.markdown('<h3 style="margin-top: 30px; margin-bottom: 15px; color: #1f2937;">🏛️ Iconic Landmarks</h3>', unsafe_allow_html=True)
+    landmark_html = '<div style="margin: 10px 0;">'
+    for landmark in landmarks[:5]:
+        landmark_html += f'<span class="landmark-tag">🏛️ {landmark}</span>'
+    landmark_html += '</div>'
+    st.markdown(landmark_html, unsafe_allow_html=True)
+
+def render_food_image(food_images_api, display_destination):
+    try:
+        food_img = food_images_api[0] if food_images_api else "https://images.pexels.com/photos/1640777/pexels-photo-1640777.jpeg?auto=compress&cs=tinysrgb&w=1200"
+        st.image(food_img, caption=f"🍴 Cuisine of {display_destination}", use_container_width=True)
+    except:
+        pass
+
+def render_gallery(location_images, food_images_api, display_destination):
+    st.markdown('<h3 style="margin-top: 20px; margin-bottom: 10px; color: #1f2937;">🖼️ City Gallery</h3>', unsafe_allow_html=True)
+    for idx, url in enumerate(location_images[1:4], 1):
+        st.image(url, caption=f"Place {idx} in {display_destination}", use_container_width=True)
+    for idx, url in enumerate(food_images_api[1:3], 1):
+        st.image(url, caption=f"Food {idx} in {display_destination}", use_container_width=True)
+
+def render_timings(timings):
+    # Shown with ?debug=timings in the app URL.
+    with st.expander(f"⏱️ Backend timings ({timings.get('total_ms', 0):.0f} ms)"):
+        st.table([
+            {"stage": span["name"], "start (ms)": span["start_ms"], "duration (ms)": span["duration_ms"]}
+            for span in timings.get("spans", [])
+        ])
+
+def render_travel_tips(weather):
+    st.markdown('<h2 style="margin-top: 50px; margin-bottom: 25px;">💡 Smart Travel Tips</h2>', unsafe_allow_html=True)
+    tips_col1, tips_col2, tips_col3 = st.columns(3)
+    
+    with tips_col1:
+        st.markdown("""
+        <div class="tip-card">
+            <h4 style="margin: 0 0 15px 0; color: #92400e;">📱 Essential Apps</h4>
+            <ul style="margin: 0; padding-left: 20px; color: #78350f; line-height: 1.8;">
+                <li>Google Maps for navigation</li>
+                <li>Local transport apps</li>
+                <li>Translation tools</li>
+                <li>Currency converter</li>
+            </ul>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with tips_col2:
+        st.markdown("""
+        <div class="tip-card" style="background: linear-gradient(135deg, #d1fae5 0%, #a7f3d0 100%); border-left-color: #10b981;">
+            <h4 style="margin: 0 0 15px 0; color: #065f46;">💰 Budget Smart</h4>
+            <ul style="margin: 0; padding-left: 20px; color: #064e3b; line-height: 1.8;">
+                <li>Visit free attractions</li>
+                <li>Use public transport</li>
+                <li>Try street food</li>
+                <li>Book in advance</li>
+            </ul>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with tips_col3:
+        st.markdown(f"""
+        <div class="tip-card" style="background: linear-gradient(135deg, #dbeafe 0%, #bfdbfe 100%); border-left-color: #3b82f6;">
+            <h4 style="margin: 0 0 15px 0; color: #1e40af;">🌡️ Weather Ready</h4>
+            <ul style="margin: 0; padding-left: 20px; color: #1e3a8a; line-height: 1.8;">
+                <li>Pack for {weather.get('conditions', 'variable weather')}</li>
+                <li>Dress in layers</li>
+                <li>Stay hydrated</li>
+                <li>Sun protection</li>
+            </ul>
+        </div>
+        """, unsafe_allow_html=True)
+
 def main():
     st.set_page_config(
         page_title="AI Travel Planner", 
@@ -386,311 +748,113 @@ def main():
         
         with st.spinner("⏳ Creating your itinerary..."):
             try:
-                response = requests.post(
-                    API_URL, 
-                    json={
-                        "city": destination,
-                        "days": days,
-                        "budget": budget,
-                        "interests": interests
-                    }, 
-                    timeout=ITINERARY_TIMEOUT_SECONDS
-                )
+                show_timings = st.query_params.get("debug") == "timings"
+                status_code, events = fetch_itinerary_events(destination, days, budget, interests, debug=show_timings)
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    display_destination = data.get("resolved_city", destination)
-                    city_corrected = data.get("city_corrected", False)
-                    input_city = data.get("input_city", destination)
-                    city_key = display_destination.lower()
-                    location_images = data.get("location_images", [])
-                    food_images_api = data.get("food_images", [])
-
-                    if city_corrected and city_key != input_city.lower():
-                        st.info(f"Showing results for **{display_destination}** (searched: `{input_city}`).")
-
-                    # Enhanced trip header with gradient animation
-                    st.markdown(
-                        f"""
-                        <div class="trip-header">
-                            <h1 style="color: #ffffff; -webkit-text-fill-color: #ffffff; background: none; -webkit-background-clip: initial; font-size: 42px; font-weight: 700; text-shadow: 0 4px 12px rgba(0, 0, 0, 0.35);">
-                                🧳 Your {days}-Day Travel Plan to {display_destination}
-                            </h1>
-                            <p style="color: #ffffff; font-size: 18px; text-shadow: 0 2px 6px rgba(0, 0, 0, 0.3);">
-                                {start_date.strftime('%B %d, %Y')} → {(start_date + datetime.timedelta(days=days - 1)).strftime('%B %d, %Y')}
-                            </p>
-                        </div>
-                        """,
-                        unsafe_allow_html=True,
-                    )
+                if status_code == 200:
+                    # Sections are laid out as placeholders up front and filled
+                    # in as the backend streams each one.
+                    notice_slot = st.empty()
+                    header_slot = st.empty()
+                    with header_slot.container():
+                        render_trip_header(destination, days, start_date)
+                    degraded_slot = st.empty()
 
-                    
                     # Main content columns
                     col1, col2 = st.columns([2, 1])
                     
                     with col1:
-                        # Enhanced Weather Card
-                        weather = data.get("weather", {})
-                        temp = weather.get('temperature', 25)
-                        conditions = weather.get('conditions', 'Sunny')
-                        humidity = weather.get('humidity', 60)
-                        
-                        st.markdown(f"""
-                        <div class="weather-card">
-                            <div style="display: flex; align-items: center; justify-content: space-between;">
-                                <div>
-                                    <h2 style="margin: 0; color: white; font-size: 28px;">🌡️ Weather in {display_destination}</h2>
-                                    <p style="margin: 10px 0 0 0; opacity: 0.9; font-size: 16px;">{conditions}</p>
-                                </div>
-                                <div style="text-align: right;">
-                                    <div style="color: white; font-size: 56px; line-height: 1; font-weight: 700;">{temp}°C</div>
-                                    <p style="margin: 5px 0 0 0; opacity: 0.9;">Humidity: {humidity}%</p>
-                                </div>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        # City description with icon
-                        st.markdown(f"""
-                        <div class="card" style="border-left-color: #667eea;">
-                            <div style="display: flex; align-items: start;">
-                                <div class="icon-wrapper">📌</div>
-                                <div style="flex: 1;">
-                                    <h3 style="margin: 0 0 12px 0; color: #1f2937;">About {display_destination}</h3>
-                                    <p style="color: #4b5563; line-height: 1.8; margin: 0;">{data.get('description', f'{display_destination} is a beautiful destination with rich culture and history.')}</p>
-                                </div>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        # Daily Itinerary with enhanced icons
-                        st.markdown('<h2 style="margin-top: 40px; margin-bottom: 20px;">📅 Day-by-Day Itinerary</h2>', unsafe_allow_html=True)
-                        
-                        itinerary = data.get("itinerary", [])
-                        for day_plan in itinerary:
-                            day_num = day_plan.get('day', 1)
-                            current_date = start_date + datetime.timedelta(days=day_num-1)
-                            
-                            morning_text = day_plan.get('morning', 'Morning activity')
-                            lunch_text = day_plan.get('lunch', 'Lunch recommendation')
-                            afternoon_text = day_plan.get('afternoon', 'Afternoon activity')
-                            evening_text = day_plan.get('evening', 'Evening activity')
-                            
-                            st.markdown(f"""
-                            <div class="day-card">
-                                <div style="display: flex; align-items: center; margin-bottom: 20px;">
-                                    <div class="icon-wrapper" style="background: linear-gradient(135deg, #10b981 0%, #059669 100%);">📅</div>
-                                    <div>
-                                        <h3 style="margin: 0; color: #1f2937;">Day {day_num} - {current_date.strftime('%A, %B %d')}</h3>
-                                    </div>
-                                </div>
-                            """, unsafe_allow_html=True)
-                            
-                            # Morning activity
-                            st.markdown(f"""
-                                <div class="activity-row morning">
-                                    <span style="font-size: 24px; margin-right: 12px;">🕘</span>
-                                    <div>
-                                        <strong style="color: #92400e; font-size: 14px; text-transform: uppercase;">Morning</strong>
-                                        <p style="margin: 4px 0 0 0; color: #1f2937;">{morning_text}</p>
-                                    </div>
-                                </div>
-                            """, unsafe_allow_html=True)
-                            
-                            # Lunch activity
-                            st.markdown(f"""
-                                <div class="activity-row lunch">
-                                    <span style="font-size: 24px; margin-right: 12px;">🍴</span>
-                                    <div>
-                                        <strong style="color: #991b1b; font-size: 14px; text-transform: uppercase;">Lunch</strong>
-                                        <p style="margin: 4px 0 0 0; color: #1f2937;">{lunch_text}</p>
-                                    </div>
-                                </div>
-                            """, unsafe_allow_html=True)
-                            
-                            # Afternoon activity
-                            st.markdown(f"""
-                                <div class="activity-row afternoon">
-                                    <span style="font-size: 24px; margin-right: 12px;">🕒</span>
-                                    <div>
-                                        <strong style="color: #1e40af; font-size: 14px; text-transform: uppercase;">Afternoon</strong>
-                                        <p style="margin: 4px 0 0 0; color: #1f2937;">{afternoon_text}</p>
-                                    </div>
-                                </div>
-                            """, unsafe_allow_html=True)
-                            
-                            # Evening activity
-                            st.markdown(f"""
-                                <div class="activity-row evening">
-                                    <span style="font-size: 24px; margin-right: 12px;">🌆</span>
-                                    <div>
-                                        <strong style="color: #6b21a8; font-size: 14px; text-transform: uppercase;">Evening</strong>
-                                        <p style="margin: 4px 0 0 0; color: #1f2937;">{evening_text}</p>
-                                    </div>
-                                </div>
-                            </div>
-                            """, unsafe_allow_html=True)
+                        weather_slot = st.empty()
+                        description_slot = st.empty()
+                        days_slot = st.empty()
                         
                         # Enhanced Tabs for Restaurants and Attractions
                         st.markdown('<h2 style="margin-top: 40px; margin-bottom: 20px;">📌 Recommendations</h2>', unsafe_allow_html=True)
                         tab1, tab2 = st.tabs(["🍴 Restaurants", "🏛️ Attractions"])
-                        
                         with tab1:
-                            restaurants = data.get("restaurants", [])
-                            if restaurants:
-                                for i, restaurant in enumerate(restaurants[:8], 1):
-                                    name = restaurant.get('name', 'Restaurant')
-                                    address = restaurant.get('address', restaurant.get('address_line2', destination))
-                                    price_range = restaurant.get('price_range', '$$')
-                                    specialty = restaurant.get('specialty', 'Local cuisine')
-                                    rating = restaurant.get('rating', 4.0)
-                                    
-                                    st.markdown(f"""
-                                    <div class="card food-card">
-                                        <div style="display: flex; align-items: start; justify-content: space-between;">
-                                            <div style="display: flex; align-items: start; flex: 1;">
-                                                <div style="background: linear-gradient(135deg, #FF4B4B 0%, #dc2626 100%); color: white; width: 42px; height: 42px; border-radius: 10px; display: flex; align-items: center; justify-content: center; font-weight: 700; margin-right: 16px; box-shadow: 0 4px 12px rgba(255, 75, 75, 0.3);">{i}</div>
-                                                <div style="flex: 1;">
-                                                    <h4 style="margin: 0 0 8px 0; color: #1f2937; font-size: 18px;">{name}</h4>
-                                                    <p style="margin: 6px 0; color: #6b7280; font-size: 14px;"><span style="margin-right: 8px;">📌</span>{address}</p>
-                                                    <div style="margin-top: 10px;">
-                                                        <span class="price-badge">{price_range}</span>
-                                                        <span style="color: #4b5563; font-size: 14px;">🍽️ {specialty}</span>
-                                                    </div>
-                                                </div>
-                                            </div>
-                                            <div class="rating-badge">⭐ {rating}</div>
-                                        </div>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                            else:
-                                st.info(f"🔍 Explore local restaurants in {display_destination} for authentic dining experiences.")
-                        
+                            restaurants_slot = st.empty()
                         with tab2:
-                            attractions = data.get("attractions", [])
-                            if attractions:
-                                for i, attraction in enumerate(attractions[:10], 1):
-                                    name = attraction.get('name', 'Attraction')
-                                    address = attraction.get('address_line2', attraction.get('formatted', destination))
-                                    category = attraction.get('categories', {}).get('name', 'Attraction')
-                                    
-                                    st.markdown(f"""
-                                    <div class="card landmark-card">
-                                        <div style="display: flex; align-items: start;">
-                                            <div style="background: linear-gradient(135deg, #1C83E1 0%, #1e40af 100%); color: white; width: 42px; height: 42px; border-radius: 10px; display: flex; align-items: center; justify-content: center; font-weight: 700; margin-right: 16px; box-shadow: 0 4px 12px rgba(28, 131, 225, 0.3);">{i}</div>
-                                            <div style="flex: 1;">
-                                                <h4 style="margin: 0 0 8px 0; color: #1f2937; font-size: 18px;">{name}</h4>
-                                                <p style="margin: 6px 0; color: #6b7280; font-size: 14px;"><span style="margin-right: 8px;">📌</span>{address}</p>
-                                                <div style="margin-top: 10px;">
-                                                    <span style="background: linear-gradient(135deg, #dbeafe 0%, #bfdbfe 100%); color: #1e40af; padding: 4px 12px; border-radius: 12px; font-weight: 600; font-size: 13px;">🏷️ {category}</span>
-                                                </div>
-                                            </div>
-                                        </div>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                            else:
-                                st.info(f"🔍 Discover amazing attractions and landmarks in {display_destination}.")
+                            attractions_slot = st.empty()
                     
                     with col2:
-                        # Enhanced Destination Image with location-specific search
-                        try:
-                            image_url = location_images[0] if location_images else "https://images.pexels.com/photos/346885/pexels-photo-346885.jpeg?auto=compress&cs=tinysrgb&w=1200"
-                            
-                            st.image(image_url, caption=f"🖼️ {display_destination}", use_container_width=True)
-                        except:
-                            # Fallback image
-                            st.image("https://images.pexels.com/photos/3944104/pexels-photo-3944104.jpeg?auto=compress&cs=tinysrgb&w=800", 
-                                    caption=f"🖼️ {display_destination}", use_container_width=True)
-                        
-                        # Enhanced Trip Summary
-                        st.markdown(f"""
-                        <div class="summary-box">
-                            <h3 style="margin: 0 0 20px 0; color: #1f2937; text-align: center;">📋 Trip Summary</h3>
-                            <p><span style="font-size: 20px; margin-right: 8px;">📌</span><strong>Destination:</strong> {display_destination}</p>
-                            <p><span style="font-size: 20px; margin-right: 8px;">📅</span><strong>Duration:</strong> {days} days</p>
-                            <p><span style="font-size: 20px; margin-right: 8px;">💰</span><strong>Budget:</strong> {budget}</p>
-                            <p><span style="font-size: 20px; margin-right: 8px;">🧩</span><strong>Interests:</strong> {', '.join(interests) if interests else 'Not specified'}</p>
-                            <p><span style="font-size: 20px; margin-right: 8px;">📆</span><strong>Dates:</strong> {start_date.strftime('%b %d')} - {(start_date + datetime.timedelta(days=days-1)).strftime('%b %d, %Y')}</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        # Local Specialties with enhanced tags
-                        st.markdown('<h3 style="margin-top: 30px; margin-bottom: 15px; color: #1f2937;">🍴 Local Specialties</h3>', unsafe_allow_html=True)
-                        specialties = data.get("local_specialties", [])
-                        specialty_html = '<div style="margin: 10px 0;">'
-                        for food in specialties[:5]:
-                            specialty_html += f'<span class="specialty-tag">🍽️ {food}</span>'
-                        specialty_html += '</div>'
-                        st.markdown(specialty_html, unsafe_allow_html=True)
-                        
-                        # Famous Landmarks with enhanced tags
-                        st.markdown('<h3 style="margin-top: 30px; margin-bottom: 15px; color: #1f2937;">🏛️ Iconic Landmarks</h3>', unsafe_allow_html=True)
-                        landmarks = data.get("famous_landmarks", [])
-                        landmark_html = '<div style="margin: 10px 0;">'
-                        for landmark in landmarks[:5]:
-                            landmark_html += f'<span class="landmark-tag">🏛️ {landmark}</span>'
-                        landmark_html += '</div>'
-                        st.markdown(landmark_html, unsafe_allow_html=True)
-                        
-                        # Additional destination image - Food
-                        try:
-                            food_img = food_images_api[0] if food_images_api else "https://images.pexels.com/photos/1640777/pexels-photo-1640777.jpeg?auto=compress&cs=tinysrgb&w=1200"
-                            st.image(food_img, caption=f"🍴 Cuisine of {display_destination}", use_container_width=True)
-                        except:
-                            pass
-
-                        # Mini gallery from place + food APIs
-                        st.markdown('<h3 style="margin-top: 20px; margin-bottom: 10px; color: #1f2937;">🖼️ City Gallery</h3>', unsafe_allow_html=True)
-                        for idx, url in enumerate(location_images[1:4], 1):
-                            st.image(url, caption=f"Place {idx} in {display_destination}", use_container_width=True)
-                        for idx, url in enumerate(food_images_api[1:3], 1):
-                            st.image(url, caption=f"Food {idx} in {display_destination}", use_container_width=True)
-                    
-                    # Enhanced Travel Tips
-                    st.markdown('<h2 style="margin-top: 50px; margin-bottom: 25px;">💡 Smart Travel Tips</h2>', unsafe_allow_html=True)
-                    tips_col1, tips_col2, tips_col3 = st.columns(3)
+                        image_slot = st.empty()
+                        summary_slot = st.empty()
+                        with summary_slot.container():
+                            render_trip_summary(destination, days, budget, interests, start_date)
+                        specialties_slot = st.empty()
+                        landmarks_slot = st.empty()
+                        food_image_slot = st.empty()
+                        gallery_slot = st.empty()
                     
-                    with tips_col1:
-                        st.markdown("""
-                        <div class="tip-card">
-                            <h4 style="margin: 0 0 15px 0; color: #92400e;">📱 Essential Apps</h4>
-                            <ul style="margin: 0; padding-left: 20px; color: #78350f; line-height: 1.8;">
-                                <li>Google Maps for navigation</li>
-                                <li>Local transport apps</li>
-                                <li>Translation tools</li>
-                                <li>Currency converter</li>
-                            </ul>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    
-                    with tips_col2:
-                        st.markdown("""
-                        <div class="tip-card" style="background: linear-gradient(135deg, #d1fae5 0%, #a7f3d0 100%); border-left-color: #10b981;">
-                            <h4 style="margin: 0 0 15px 0; color: #065f46;">💰 Budget Smart</h4>
-                            <ul style="margin: 0; padding-left: 20px; color: #064e3b; line-height: 1.8;">
-                                <li>Visit free attractions</li>
-                                <li>Use public transport</li>
-                                <li>Try street food</li>
-                                <li>Book in advance</li>
-                            </ul>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    
-                    with tips_col3:
-                        st.markdown(f"""
-                        <div class="tip-card" style="background: linear-gradient(135deg, #dbeafe 0%, #bfdbfe 100%); border-left-color: #3b82f6;">
-                            <h4 style="margin: 0 0 15px 0; color: #1e40af;">🌡️ Weather Ready</h4>
-                            <ul style="margin: 0; padding-left: 20px; color: #1e3a8a; line-height: 1.8;">
-                                <li>Pack for {weather.get('conditions', 'variable weather')}</li>
-                                <li>Dress in layers</li>
-                                <li>Stay hydrated</li>
-                                <li>Sun protection</li>
-                            </ul>
-                        </div>
-                        """, unsafe_allow_html=True)
+                    tips_slot = st.empty()
+                    with tips_slot.container():
+                        render_travel_tips({})
+                    timings_slot = st.empty()
+
+                    data = {}
+                    display_destination = destination
+                    for event in events:
+                        kind = event.get("event")
+                        if kind == "done":
+                            break
+                        if kind == "error":
+                            st.error(f"❌ An error occurred: {event.get('message', 'itinerary stream failed')}")
+                            break
+                        section = event.get("data") or {}
+                        data.update(section)
+
+                        if "resolved_city" in section:
+                            display_destination = data.get("resolved_city", destination)
+                            city_corrected = data.get("city_corrected", False)
+                            input_city = data.get("input_city", destination)
+                            if city_corrected and display_destination.lower() != input_city.lower():
+                                notice_slot.info(f"Showing results for **{display_destination}** (searched: `{input_city}`).")
+                            with header_slot.container():
+                                render_trip_header(display_destination, days, start_date)
+                            with description_slot.container():
+                                render_description(data.get("description"), display_destination)
+                            with summary_slot.container():
+                                render_trip_summary(display_destination, days, budget, interests, start_date)
+                        if "weather" in section:
+                            with weather_slot.container():
+                                render_weather(data.get("weather", {}), display_destination)
+                            with tips_slot.container():
+                                render_travel_tips(data.get("weather", {}))
+                        if "itinerary" in section:
+                            with days_slot.container():
+                                render_day_plans(data.get("itinerary", []), start_date)
+                        if "restaurants" in section:
+                            with restaurants_slot.container():
+                                render_restaurants(data.get("restaurants", []), destination, display_destination)
+                        if "attractions" in section:
+                            with attractions_slot.container():
+                                render_attractions(data.get("attractions", []), destination, display_destination)
+                        if "famous_landmarks" in section:
+                            with landmarks_slot.container():
+                                render_landmarks(data.get("famous_landmarks", []))
+                        if "local_specialties" in section:
+                            with specialties_slot.container():
+                                render_specialties(data.get("local_specialties", []))
+                        if "location_images" in section:
+                            with image_slot.container():
+                                render_destination_image(data.get("location_images", []), display_destination)
+                        if "food_images" in section:
+                            with food_image_slot.container():
+                                render_food_image(data.get("food_images", []), display_destination)
+                        if "location_images" in section or "food_images" in section:
+                            with gallery_slot.container():
+                                render_gallery(data.get("location_images", []), data.get("food_images", []), display_destination)
+                        if "timings" in section:
+                            with timings_slot.container():
+                                render_timings(section["timings"])
+                        if section.get("degraded"):
+                            degraded_slot.caption(
+                                "⏱️ Some providers were slow, so these sections show suggested defaults: "
+                                + ", ".join(section["degraded"])
+                            )
                     
                 else:
-                    st.error(f"❌ Failed to fetch itinerary. Status: {response.status_code}")
+                    st.error(f"❌ Failed to fetch itinerary. Status: {status_code}")
                     
             except requests.exceptions.ConnectionError:
                 st.error("❌ Cannot connect to the server. Make sure Flask is running!")
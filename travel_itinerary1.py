@@ -1,11 +1,63 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, redirect, request, jsonify
 from flask_cors import CORS
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from array import array
+from bisect import bisect_left
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from werkzeug.middleware.proxy_fix import ProxyFix
+from urllib.parse import urlencode, urljoin, urlsplit
+import argparse
 import requests
 import random
 import os
+import contextlib
+import contextvars
+import copy
+import functools
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import math
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 app = Flask(__name__)
 CORS(app)
+# Render (and most hosts) terminate TLS in front of the app; trust that many
+# X-Forwarded-* hops so request.host_url carries the public scheme and host.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 1))
+if TRUSTED_PROXY_HOPS > 0:
+    app.wsgi_app = ProxyFix(
+        app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS, x_host=TRUSTED_PROXY_HOPS
+    )
 
 # API Keys
 
@@ -14,28 +66,998 @@ OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 GEOAPIFY_API_KEY = os.getenv("GEOAPIFY_API_KEY")
 SPOONACULAR_API_KEY = os.getenv("SPOONACULAR_API_KEY")
 
-OPENWEATHER_GEO_URL = "http://api.openweathermap.org/geo/1.0/direct"
-OPENWEATHER_WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
-GEOAPIFY_PLACES_URL = "https://api.geoapify.com/v2/places"
-SPOONACULAR_SEARCH_URL = "https://api.spoonacular.com/recipes/complexSearch"
-WIKIPEDIA_API_URL = "https://en.wikipedia.org/w/api.php"
+# Base URLs can point at local stubs (see bench/) instead of the live APIs.
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org").rstrip("/")
+GEOAPIFY_BASE_URL = os.getenv("GEOAPIFY_BASE_URL", "https://api.geoapify.com").rstrip("/")
+SPOONACULAR_BASE_URL = os.getenv("SPOONACULAR_BASE_URL", "https://api.spoonacular.com").rstrip("/")
+WIKIPEDIA_BASE_URL = os.getenv("WIKIPEDIA_BASE_URL", "https://en.wikipedia.org").rstrip("/")
+
+OPENWEATHER_GEO_URL = f"{OPENWEATHER_BASE_URL}/geo/1.0/direct"
+OPENWEATHER_WEATHER_URL = f"{OPENWEATHER_BASE_URL}/data/2.5/weather"
+GEOAPIFY_PLACES_URL = f"{GEOAPIFY_BASE_URL}/v2/places"
+SPOONACULAR_SEARCH_URL = f"{SPOONACULAR_BASE_URL}/recipes/complexSearch"
+WIKIPEDIA_API_URL = f"{WIKIPEDIA_BASE_URL}/w/api.php"
+
+# Upstream connection pooling. One pool per upstream host (OpenWeather, Geoapify,
+# Spoonacular, Wikipedia); POOL_MAXSIZE should cover gunicorn threads per worker
+# times the number of concurrent calls a single request makes to one host.
+UPSTREAM_POOL_CONNECTIONS = int(os.getenv("UPSTREAM_POOL_CONNECTIONS", 8))
+UPSTREAM_POOL_MAXSIZE = int(os.getenv("UPSTREAM_POOL_MAXSIZE", 32))
+UPSTREAM_POOL_BLOCK = os.getenv("UPSTREAM_POOL_BLOCK", "false").lower() == "true"
+UPSTREAM_USER_AGENT = "AI-Travel-Planner/1.0 (contact: local-app)"
+
+
+def build_upstream_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=UPSTREAM_POOL_CONNECTIONS,
+        pool_maxsize=UPSTREAM_POOL_MAXSIZE,
+        pool_block=UPSTREAM_POOL_BLOCK,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": UPSTREAM_USER_AGENT, "Connection": "keep-alive"})
+    # The session is shared across threads; never store cookies so no request
+    # mutates shared state and no upstream can leak state into another call.
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
 
+upstream_session = build_upstream_session()
 
-def safe_get_json(url, params=None, timeout=12):
+# End-to-end latency budget. Every upstream call takes its timeout from the
+# time left on the current request's deadline; once the budget is spent,
+# calls are skipped and the caller's existing fallback applies.
+ITINERARY_DEADLINE_SECONDS = float(os.getenv("ITINERARY_DEADLINE_SECONDS", 25))
+ITINERARY_MAX_DEADLINE_SECONDS = float(os.getenv("ITINERARY_MAX_DEADLINE_SECONDS", 60))
+CITY_SEARCH_DEADLINE_SECONDS = float(os.getenv("CITY_SEARCH_DEADLINE_SECONDS", 6))
+MIN_UPSTREAM_TIMEOUT_SECONDS = 0.05
+
+
+class RequestBudget:
+    def __init__(self, seconds):
+        self.deadline = time.monotonic() + seconds
+        self.degraded_providers = set()  # providers whose calls were skipped or cut short
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+
+current_budget = contextvars.ContextVar("current_budget", default=None)
+
+
+@contextlib.contextmanager
+def request_budget(seconds):
+    budget = RequestBudget(seconds)
+    token = current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        current_budget.reset(token)
+
+
+def upstream_timeout(timeout, provider=None):
+    budget = current_budget.get()
+    if budget is None:
+        return timeout
+    remaining = budget.remaining()
+    if remaining < MIN_UPSTREAM_TIMEOUT_SECONDS:
+        budget.degraded_providers.add(provider)
+        return None
+    return min(timeout, remaining)
+
+
+# Per-request stage timings, sent as a Server-Timing header and, on request,
+# as a "timings" block. Traced functions add a span to the recorder of the
+# request they run for (RequestFanout copies it into worker threads) and run
+# untimed outside a request.
+class SpanRecorder:
+    def __init__(self):
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._spans = []
+
+    def add(self, name, started, ended):
+        with self._lock:
+            self._spans.append((name, started - self.started, ended - started))
+
+    def spans(self):
+        with self._lock:
+            return sorted(self._spans, key=lambda span: span[1])
+
+    def server_timing(self):
+        totals = {}
+        for name, _, duration in self.spans():
+            count, total = totals.get(name, (0, 0.0))
+            totals[name] = (count + 1, total + duration)
+        parts = []
+        for name, (count, total) in totals.items():
+            desc = f';desc="{count} calls"' if count > 1 else ""
+            parts.append(f"{name};dur={total * 1000:.1f}{desc}")
+        parts.append(f"total;dur={(time.monotonic() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+    def report(self):
+        return {
+            "total_ms": round((time.monotonic() - self.started) * 1000, 1),
+            "spans": [
+                {"name": name, "start_ms": round(start * 1000, 1), "duration_ms": round(duration * 1000, 1)}
+                for name, start, duration in self.spans()
+            ],
+        }
+
+
+current_spans = contextvars.ContextVar("current_spans", default=None)
+
+
+def traced(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            recorder = current_spans.get()
+            if recorder is None:
+                return fn(*args, **kwargs)
+            started = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                recorder.add(name, started, time.monotonic())
+        return wrapper
+    return decorate
+
+# Shared executor for independent upstream calls. Each request gets its own
+# slot budget so a single itinerary cannot occupy every worker thread.
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", 32))
+PIPELINE_PER_REQUEST_CONCURRENCY = int(os.getenv("PIPELINE_PER_REQUEST_CONCURRENCY", 6))
+
+pipeline_executor = ThreadPoolExecutor(max_workers=PIPELINE_MAX_WORKERS, thread_name_prefix="upstream")
+
+
+class RequestFanout:
+    def __init__(self, limit=PIPELINE_PER_REQUEST_CONCURRENCY):
+        self._slots = threading.BoundedSemaphore(max(1, limit))
+
+    def submit(self, fn, *args, **kwargs):
+        # Blocks the calling request thread (never a pool thread) until one of
+        # its own slots frees up. Tasks run in a copy of the caller's context
+        # so they see its request budget.
+        self._slots.acquire()
+        try:
+            future = pipeline_executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def map(self, fn, items):
+        futures = [self.submit(fn, item) for item in items]
+        return [f.result() for f in futures]
+
+
+# In-process response cache. TTLs are per provider: geocoding and POIs change
+# on the order of days, weather within minutes. Empty-but-valid answers (no
+# geocoder match, no thumbnail) are cached for CACHE_NEGATIVE_TTL_SECONDS.
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 5000))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("CACHE_NEGATIVE_TTL_SECONDS", 3600))
+CACHE_TTL_SECONDS = {
+    "openweather_geo": int(os.getenv("CACHE_TTL_GEOCODE", 7 * 24 * 3600)),
+    "openweather_weather": int(os.getenv("CACHE_TTL_WEATHER", 600)),
+    "geoapify": int(os.getenv("CACHE_TTL_PLACES", 24 * 3600)),
+    "spoonacular": int(os.getenv("CACHE_TTL_FOOD", 24 * 3600)),
+    "wikipedia": int(os.getenv("CACHE_TTL_WIKIPEDIA", 7 * 24 * 3600)),
+}
+
+PROVIDER_BY_URL = {
+    OPENWEATHER_GEO_URL: "openweather_geo",
+    OPENWEATHER_WEATHER_URL: "openweather_weather",
+    GEOAPIFY_PLACES_URL: "geoapify",
+    SPOONACULAR_SEARCH_URL: "spoonacular",
+    WIKIPEDIA_API_URL: "wikipedia",
+}
+
+# Credentials never become part of a cache key.
+CACHE_KEY_IGNORED_PARAMS = {"appid", "apiKey"}
+
+
+class ResponseCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, serialized payload)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+        self.evictions = 0
+
+    def get(self, key, provider=None):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits[provider] += 1
+                payload = entry[1]
+            else:
+                if entry is not None:
+                    self._drop(key)
+                self.misses[provider] += 1
+                return False, None
+        # Deserialize outside the lock; callers get a private copy they may mutate.
+        return True, json.loads(payload)
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        payload = json.dumps(value, separators=(",", ":"))
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.time() + ttl, payload)
+            self._bytes += len(payload)
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            providers = sorted(set(self.hits) | set(self.misses), key=str)
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+                "hits": sum(self.hits.values()),
+                "misses": sum(self.misses.values()),
+                "providers": {
+                    str(p): {"hits": self.hits[p], "misses": self.misses[p]} for p in providers
+                },
+            }
+
+
+response_cache = ResponseCache()
+
+# Optional second tier on local disk, shared by every gunicorn worker on the
+# host and surviving restarts. Weather is excluded: it expires in minutes.
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "")
+CACHE_DB_MAX_BYTES = int(os.getenv("CACHE_DB_MAX_BYTES", 256 * 1024 * 1024))
+CACHE_DB_PRUNE_EVERY = int(os.getenv("CACHE_DB_PRUNE_EVERY", 200))
+CACHE_DB_PROVIDERS = {"openweather_geo", "geoapify", "spoonacular", "wikipedia"}
+
+
+class DiskResponseCache:
+    def __init__(self, path, max_bytes=CACHE_DB_MAX_BYTES, prune_every=CACHE_DB_PRUNE_EVERY):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.prune_every = max(1, prune_every)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " provider TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        # Daily itinerary counts per destination, for cache pre-warming.
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS destinations ("
+            " name TEXT NOT NULL,"
+            " day INTEGER NOT NULL,"
+            " hits INTEGER NOT NULL,"
+            " PRIMARY KEY (name, day))"
+        )
+
+    def _connection(self):
+        # One connection per thread and per process: gunicorn forks workers
+        # after import, and sqlite connections must not cross a fork.
+        pid = os.getpid()
+        cached = getattr(self._local, "conn", None)
+        if cached is not None and cached[0] == pid:
+            return cached[1]
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = (pid, conn)
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT payload, expires_at, accessed_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return False, None, 0
+            # Refresh recency coarsely so hot reads do not turn into writes.
+            if now - row[2] > 60:
+                conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return True, json.loads(row[0]), row[1] - now
+        except (sqlite3.Error, ValueError):
+            self.errors += 1
+            return False, None, 0
+
+    def set(self, key, provider, value, ttl):
+        if ttl <= 0:
+            return
+        now = time.time()
+        payload = json.dumps(value, separators=(",", ":"))
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO responses (key, provider, payload, size, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, provider, payload, len(payload), now + ttl, now),
+            )
+        except sqlite3.Error:
+            self.errors += 1
+            return
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.prune_every == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        try:
+            conn = self._connection()
+            conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            # Keep the most recently used rows that fit in the byte budget.
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM ("
+                "  SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS running"
+                "  FROM responses)"
+                " WHERE running > ?)",
+                (self.max_bytes,),
+            )
+        except sqlite3.Error:
+            self.errors += 1
+
+    def count_destination(self, name, day):
+        try:
+            self._connection().execute(
+                "INSERT INTO destinations (name, day, hits) VALUES (?, ?, 1)"
+                " ON CONFLICT (name, day) DO UPDATE SET hits = hits + 1",
+                (name, day),
+            )
+        except sqlite3.Error:
+            self.errors += 1
+
+    def top_destinations(self, since_day, limit):
+        try:
+            conn = self._connection()
+            conn.execute("DELETE FROM destinations WHERE day < ?", (since_day,))
+            rows = conn.execute(
+                "SELECT name FROM destinations WHERE day >= ?"
+                " GROUP BY name ORDER BY SUM(hits) DESC, name LIMIT ?",
+                (since_day, limit),
+            ).fetchall()
+        except sqlite3.Error:
+            self.errors += 1
+            return []
+        return [row[0] for row in rows]
+
+    def stats(self):
+        try:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+def build_disk_cache():
+    if not (CACHE_ENABLED and CACHE_DB_PATH):
+        return None
+    try:
+        return DiskResponseCache(CACHE_DB_PATH)
+    except sqlite3.Error:
+        return None
+
+
+disk_cache = build_disk_cache()
+
+
+def cache_key(url, params=None):
+    items = sorted(
+        (k, str(v).strip()) for k, v in (params or {}).items() if k not in CACHE_KEY_IGNORED_PARAMS
+    )
+    return url + "?" + json.dumps(items, separators=(",", ":"))
+
+
+def _is_empty_payload(provider, data):
+    if not data:
+        return True
+    if provider == "geoapify":
+        return not data.get("features")
+    if provider == "spoonacular":
+        return not data.get("results")
+    if provider == "wikipedia":
+        pages = (data.get("query") or {}).get("pages") or {}
+        return not any((page.get("thumbnail") or {}).get("source") for page in pages.values())
+    return False
+
+
+# Identical upstream lookups that are in flight at the same moment share one
+# call. Followers wait at most the leader's timeout plus a grace period, then
+# give up and take the fallback path rather than hang on a stuck leader.
+SINGLE_FLIGHT_GRACE_SECONDS = float(os.getenv("SINGLE_FLIGHT_GRACE_SECONDS", 2))
+
+
+class _Flight:
+    __slots__ = ("done", "result")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.coalesced = Counter()
+
+    def do(self, key, fn, wait_timeout, provider=None):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced[provider] += 1
+
+        if not leader:
+            if flight.done.wait(wait_timeout):
+                # Each waiter gets its own copy, as it would from the cache.
+                return copy.deepcopy(flight.result)
+            return None
+
+        try:
+            flight.result = fn()
+            return flight.result
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "coalesced": {str(p): n for p, n in self.coalesced.items()},
+            }
+
+
+upstream_flights = SingleFlight()
+
+
+# Per-provider circuit breakers. A provider whose recent calls mostly fail or
+# run slower than BREAKER_SLOW_CALL_SECONDS is skipped for BREAKER_OPEN_SECONDS,
+# so requests go straight to their fallbacks instead of waiting out timeouts.
+# After that one probe call is let through (half-open) to test recovery.
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", 20))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", 5))
+BREAKER_FAILURE_RATIO = float(os.getenv("BREAKER_FAILURE_RATIO", 0.5))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", 8))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", 30))
+# A probe that never reports back (worker killed mid-call) is given up after
+# this long so another call can probe.
+BREAKER_PROBE_TIMEOUT_SECONDS = float(os.getenv("BREAKER_PROBE_TIMEOUT_SECONDS", 60))
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name):
+        self.name = name
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=BREAKER_WINDOW)  # True = failed or slow
+        self._opened_at = 0.0
+        self._probe_started = None  # monotonic start of the half-open probe
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.short_circuited = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < BREAKER_OPEN_SECONDS:
+                    self.short_circuited += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_started = None
+            now = time.monotonic()
+            if self._probe_started is not None and now - self._probe_started < BREAKER_PROBE_TIMEOUT_SECONDS:
+                self.short_circuited += 1
+                return False
+            self._probe_started = now
+            return True
+
+    def cancel_probe(self):
+        # The call allowed through never reached the provider (e.g. the rate
+        # limiter refused it); let the next call probe instead.
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_started = None
+
+    def record(self, ok, latency):
+        failed = not ok or latency > BREAKER_SLOW_CALL_SECONDS
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_started = None
+                if failed:
+                    self._open()
+                else:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                return
+            if self.state == self.OPEN:
+                return
+            self._outcomes.append(failed)
+            if (
+                len(self._outcomes) >= BREAKER_MIN_CALLS
+                and sum(self._outcomes) / len(self._outcomes) >= BREAKER_FAILURE_RATIO
+            ):
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.times_opened += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": sum(self._outcomes),
+                "times_opened": self.times_opened,
+                "short_circuited": self.short_circuited,
+            }
+
+
+circuit_breakers = {provider: CircuitBreaker(provider) for provider in PROVIDER_BY_URL.values()}
+
+# Prometheus text-format metrics for /metrics. Values are per process, so with
+# several gunicorn workers each scrape sees one worker; sum them in queries.
+# Counters, gauges and fixed-bucket histograms keyed by their label values are
+# all this needs, so there is no client library.
+METRICS_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60)
+
+
+class Metrics:
+    def __init__(self, buckets=METRICS_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._kinds = {}
+        self._help = {}
+        self._series = {}
+
+    def describe(self, name, kind, text):
+        self._kinds[name] = kind
+        self._help[name] = text
+        self._series[name] = {}
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._series[name][tuple(sorted(labels.items()))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series[name]
+            counts = series.get(key)
+            if counts is None:
+                # One slot per bucket, then +Inf, then the running sum.
+                counts = series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect_left(self.buckets, seconds)] += 1
+            counts[-1] += seconds
+
+    @staticmethod
+    def _labels(pairs):
+        if not pairs:
+            return ""
+        escaped = []
+        for k, v in pairs:
+            v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            escaped.append(f'{k}="{v}"')
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, kind in self._kinds.items():
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(self._series[name].items()):
+                    if kind != "histogram":
+                        lines.append(f"{name}{self._labels(key)} {value}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + ("+Inf",), value[:-1]):
+                        cumulative += count
+                        le = bound if bound == "+Inf" else float(bound)
+                        lines.append(f"{name}_bucket{self._labels(key + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{self._labels(key)} {value[-1]}")
+                    lines.append(f"{name}_count{self._labels(key)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("travel_upstream_requests_total", "counter", "Upstream API calls by provider and outcome (ok, client_error, throttled, server_error, error).")
+metrics.describe("travel_upstream_request_seconds", "histogram", "Upstream API call latency by provider, one sample per attempt.")
+metrics.describe("travel_upstream_in_flight", "gauge", "Upstream API calls currently waiting on the provider.")
+metrics.describe("travel_http_requests_total", "counter", "Served HTTP requests by route and status.")
+metrics.describe("travel_http_request_seconds", "histogram", "Time to finish sending a response, by route (streams included).")
+metrics.describe("travel_http_in_flight", "gauge", "HTTP requests currently being served, by route.")
+metrics.describe("travel_fallbacks_total", "counter", "Sections filled with generated defaults instead of provider data, by kind.")
+metrics.describe("travel_cache_hits_total", "counter", "In-memory response cache hits by provider.")
+metrics.describe("travel_cache_misses_total", "counter", "In-memory response cache misses by provider.")
+metrics.describe("travel_circuit_breaker_open", "gauge", "1 when a provider's circuit breaker is open or half-open.")
+
+
+# Per-API-key token buckets. Each key (OpenWeather geocoding and weather
+# share one) refills at <NAME>_RATE_PER_SECOND up to <NAME>_RATE_BURST and
+# counts calls against <NAME>_DAILY_QUOTA (UTC day, 0 = none). Calls queue for
+# a token instead of firing into 429s. Interactive work (/itinerary,
+# /city-search) waits at most RATE_LIMIT_INTERACTIVE_WAIT_SECONDS and goes
+# first; batch work (bulk itineraries, pre-warming) waits longer, leaves part
+# of the burst and of the daily quota to interactive calls, and yields to any
+# interactive waiter. A call that gets no token is skipped like one cut by the
+# deadline and its section is reported as degraded. Limits are per process:
+# with WEB_CONCURRENCY gunicorn workers each gets that share.
+RATE_LIMIT_DEFAULTS = {
+    # name: (tokens per second, burst, daily quota)
+    "openweather": (1, 60, 30000),
+    "geoapify": (5, 5, 3000),
+    "spoonacular": (1, 2, 150),
+}
+RATE_LIMIT_KEY_BY_PROVIDER = {
+    "openweather_geo": "openweather",
+    "openweather_weather": "openweather",
+    "geoapify": "geoapify",
+    "spoonacular": "spoonacular",
+}
+RATE_LIMIT_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", 1)))
+RATE_LIMIT_INTERACTIVE_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_INTERACTIVE_WAIT_SECONDS", 2))
+RATE_LIMIT_BATCH_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_BATCH_WAIT_SECONDS", 30))
+RATE_LIMIT_BATCH_BURST_RESERVE = float(os.getenv("RATE_LIMIT_BATCH_BURST_RESERVE", 0.5))
+RATE_LIMIT_BATCH_QUOTA_SHARE = float(os.getenv("RATE_LIMIT_BATCH_QUOTA_SHARE", 0.8))
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+upstream_lane = contextvars.ContextVar("upstream_lane", default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def batch_lane():
+    token = upstream_lane.set(BATCH)
     try:
-        response = requests.get(
-            url,
-            params=params,
-            timeout=timeout,
-            headers={"User-Agent": "AI-Travel-Planner/1.0 (contact: local-app)"},
+        yield
+    finally:
+        upstream_lane.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, name, rate, burst, daily_quota):
+        self.name = name
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.daily_quota = daily_quota
+        self._cond = threading.Condition()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiting = Counter()
+        self._day = int(time.time() // 86400)
+        self.used_today = 0
+        self.rejected = Counter()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        day = int(time.time() // 86400)
+        if day != self._day:
+            self._day = day
+            self.used_today = 0
+
+    def _quota_left(self, lane):
+        if not self.daily_quota:
+            return True
+        share = 1.0 if lane == INTERACTIVE else RATE_LIMIT_BATCH_QUOTA_SHARE
+        return self.used_today < self.daily_quota * share
+
+    def acquire(self, lane, timeout):
+        # True when a call may go out; otherwise the reason it may not.
+        reserve = 0.0 if lane == INTERACTIVE else self.burst * RATE_LIMIT_BATCH_BURST_RESERVE
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if not self._quota_left(lane):
+                        reason = "quota"
+                        break
+                    yielding = lane == BATCH and self._waiting[INTERACTIVE] > 0
+                    if not yielding and now >= self._blocked_until and self._tokens >= 1 + reserve:
+                        self._tokens -= 1
+                        self.used_today += 1
+                        return True
+                    if now >= deadline:
+                        reason = "wait"
+                        break
+                    needed = max(0.0, 1 + reserve - self._tokens) / self.rate if self.rate > 0 else deadline - now
+                    self._cond.wait(min(deadline - now, max(needed, self._blocked_until - now, 0.01)))
+            finally:
+                self._waiting[lane] -= 1
+                self._cond.notify_all()
+        self.rejected[(lane, reason)] += 1
+        return reason
+
+    def back_off(self, seconds):
+        # The provider answered 429: hold every lane until Retry-After.
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def snapshot(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "tokens": round(self._tokens, 2),
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "daily_quota": self.daily_quota,
+                "used_today": self.used_today,
+                "waiting": dict(self._waiting),
+                "rejected": {f"{lane}:{reason}": n for (lane, reason), n in self.rejected.items()},
+            }
+
+
+def build_rate_limiters():
+    limiters = {}
+    for name, (rate, burst, quota) in RATE_LIMIT_DEFAULTS.items():
+        prefix = name.upper()
+        rate = float(os.getenv(f"{prefix}_RATE_PER_SECOND", rate))
+        if rate <= 0:
+            continue
+        burst = float(os.getenv(f"{prefix}_RATE_BURST", burst))
+        quota = int(os.getenv(f"{prefix}_DAILY_QUOTA", quota))
+        limiters[name] = TokenBucket(
+            name,
+            rate / RATE_LIMIT_WORKERS,
+            max(1.0, burst / RATE_LIMIT_WORKERS),
+            quota // RATE_LIMIT_WORKERS,
         )
-        if response.status_code == 200:
-            return response.json()
-    except Exception:
-        pass
+    return limiters
+
+
+rate_limiters = build_rate_limiters()
+metrics.describe("travel_rate_limited_total", "counter", "Upstream calls skipped by the rate limiter, by key, lane and reason (wait, quota).")
+metrics.describe("travel_quota_used", "gauge", "Upstream calls counted against today's quota, by key (this process).")
+
+
+def acquire_upstream_slot(provider):
+    limiter = rate_limiters.get(RATE_LIMIT_KEY_BY_PROVIDER.get(provider))
+    if limiter is None:
+        return True
+    lane = upstream_lane.get()
+    wait = RATE_LIMIT_INTERACTIVE_WAIT_SECONDS if lane == INTERACTIVE else RATE_LIMIT_BATCH_WAIT_SECONDS
+    budget = current_budget.get()
+    if budget is not None:
+        wait = min(wait, budget.remaining() - MIN_UPSTREAM_TIMEOUT_SECONDS)
+    result = limiter.acquire(lane, wait)
+    if result is True:
+        return True
+    metrics.inc("travel_rate_limited_total", key=limiter.name, lane=lane, reason=result)
+    if budget is not None:
+        budget.degraded_providers.add(provider)
+    return False
+
+
+def back_off_upstream(provider, response):
+    limiter = rate_limiters.get(RATE_LIMIT_KEY_BY_PROVIDER.get(provider))
+    if limiter is None:
+        return
+    retry_after = response.headers.get("Retry-After", "")
+    limiter.back_off(min(60.0, float(retry_after)) if retry_after.isdigit() else 1.0)
+
+
+def upstream_outcome(status_code):
+    if status_code == 200:
+        return "ok"
+    if status_code == 429:
+        return "throttled"
+    if status_code >= 500:
+        return "server_error"
+    return "client_error"
+
+
+# Bounded retries for transient failures (429, 5xx, connection errors), with
+# full-jitter exponential backoff. Retries never outlast the request budget.
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", 2))
+UPSTREAM_BACKOFF_BASE_SECONDS = float(os.getenv("UPSTREAM_BACKOFF_BASE_SECONDS", 0.2))
+UPSTREAM_BACKOFF_MAX_SECONDS = float(os.getenv("UPSTREAM_BACKOFF_MAX_SECONDS", 2))
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _retry_delay(attempt, response=None):
+    # None when the provider asks for a longer pause than
+    # UPSTREAM_BACKOFF_MAX_SECONDS: the call gives up rather than parking a
+    # worker thread (budget or not) for that long.
+    delay = random.uniform(0, min(UPSTREAM_BACKOFF_MAX_SECONDS, UPSTREAM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        if float(retry_after) > UPSTREAM_BACKOFF_MAX_SECONDS:
+            return None
+        delay = max(delay, float(retry_after))
+    return delay
+
+
+def _fetch_json(url, params=None, timeout=12, provider=None):
+    breaker = circuit_breakers.get(provider)
+    for attempt in range(UPSTREAM_MAX_RETRIES + 1):
+        if attempt and breaker and not breaker.allow():
+            return None
+        if not acquire_upstream_slot(provider):
+            if breaker:
+                breaker.cancel_probe()
+            return None
+        budget = current_budget.get()
+        if budget is not None:
+            # Time spent waiting for a token comes out of this call's timeout.
+            timeout = min(timeout, max(budget.remaining(), MIN_UPSTREAM_TIMEOUT_SECONDS))
+        started = time.monotonic()
+        response = None
+        outcome = "error"
+        metrics.inc("travel_upstream_in_flight", provider=provider)
+        try:
+            response = upstream_session.get(url, params=params, timeout=timeout)
+            outcome = upstream_outcome(response.status_code)
+            if response.status_code == 200:
+                data = response.json()
+                if breaker:
+                    breaker.record(True, time.monotonic() - started)
+                return data
+            if response.status_code == 429:
+                back_off_upstream(provider, response)
+            # Other 4xx answers (bad query, unknown city) mean the provider is
+            # healthy; only throttling and server errors count against it.
+            retryable = failed = response.status_code in RETRYABLE_STATUS_CODES
+        except ValueError:
+            outcome = "error"
+            retryable, failed = False, True
+        except Exception:
+            retryable = failed = True
+        finally:
+            metrics.inc("travel_upstream_in_flight", -1, provider=provider)
+            metrics.inc("travel_upstream_requests_total", provider=provider, outcome=outcome)
+            metrics.observe("travel_upstream_request_seconds", time.monotonic() - started, provider=provider)
+        if breaker:
+            breaker.record(not failed, time.monotonic() - started)
+        if not retryable or attempt == UPSTREAM_MAX_RETRIES:
+            break
+
+        delay = _retry_delay(attempt, response)
+        if delay is None:
+            break
+        budget = current_budget.get()
+        if budget is not None:
+            if budget.remaining() < delay + MIN_UPSTREAM_TIMEOUT_SECONDS * 2:
+                break
+            time.sleep(delay)
+            timeout = min(timeout, budget.remaining())
+        else:
+            time.sleep(delay)
     return None
 
 
+def safe_get_json(url, params=None, timeout=12):
+    provider = PROVIDER_BY_URL.get(url)
+    flight_key = cache_key(url, params)
+    key = flight_key if CACHE_ENABLED and provider else None
+    if key:
+        hit, cached = response_cache.get(key, provider)
+        if hit:
+            return cached
+        if disk_cache and provider in CACHE_DB_PROVIDERS:
+            hit, cached, remaining = disk_cache.get(key)
+            if hit:
+                response_cache.set(key, cached, remaining)
+                return cached
+
+    budgeted_timeout = upstream_timeout(timeout, provider)
+    if budgeted_timeout is None:
+        return None
+
+    breaker = circuit_breakers.get(provider)
+
+    def load():
+        if breaker and not breaker.allow():
+            return None
+        data = _fetch_json(url, params=params, timeout=budgeted_timeout, provider=provider)
+        # Only the leader writes the cache. Failures (None) are never cached
+        # so a transient outage is retried.
+        if key and data is not None:
+            ttl = CACHE_NEGATIVE_TTL_SECONDS if _is_empty_payload(provider, data) else CACHE_TTL_SECONDS[provider]
+            response_cache.set(key, data, ttl)
+            if disk_cache and provider in CACHE_DB_PROVIDERS:
+                disk_cache.set(key, provider, data, ttl)
+        return data
+
+    # Interactive callers never wait on a batch leader that may be queued in
+    # the rate limiter behind them; each lane coalesces separately.
+    data = upstream_flights.do(
+        (flight_key, upstream_lane.get()),
+        load,
+        wait_timeout=budgeted_timeout + SINGLE_FLIGHT_GRACE_SECONDS,
+        provider=provider,
+    )
+    budget = current_budget.get()
+    if data is None and budget is not None:
+        # A call cut short by the budget or skipped by an open breaker is
+        # reported as a degraded section.
+        if budgeted_timeout < timeout or (breaker and breaker.state != CircuitBreaker.CLOSED):
+            budget.degraded_providers.add(provider)
+    return data
+
+
+def seeded_random(*parts):
+    # Synthetic values (ratings, fallback weather, ...) are drawn from a
+    # generator seeded with the request's own inputs instead of the shared
+    # module-level one, so equal requests produce byte-identical bodies and
+    # threads never reseed each other.
+    return random.Random("|".join(str(part).strip().lower() for part in parts))
+
+
 def unique_by(items, key_func):
     seen = set()
     output = []
@@ -47,11 +1069,287 @@ def unique_by(items, key_func):
     return output
 
 
-def search_cities(query, limit=8):
+def city_record(city, state, country, lat, lon):
+    display_name = f"{city}, {country}" if not state else f"{city}, {state}, {country}"
+    return {
+        "city": city,
+        "state": state,
+        "country": country,
+        "lat": lat,
+        "lon": lon,
+        "display_name": display_name,
+    }
+
+
+# Local gazetteer for autocomplete, loaded from a GeoNames cities dump
+# (cities15000.txt, cities1000.txt, ...). Names are kept in parallel arrays
+# and searched through one sorted list of normalized keys, so a prefix lookup
+# is a binary search plus a short scan; results are ranked by population.
+# Prefixes of up to PREFIX_TOP_LENGTH letters match thousands of keys, so
+# their PREFIX_TOP_CITIES largest cities are ranked once at load time.
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", "")
+GAZETTEER_ADMIN1_PATH = os.getenv("GAZETTEER_ADMIN1_PATH", "")
+GAZETTEER_MIN_POPULATION = int(os.getenv("GAZETTEER_MIN_POPULATION", 0))
+# Typo-tolerant lookup: trigram overlap picks candidates, edit distance
+# re-ranks them. Trigrams shared by more keys than FUZZY_MAX_POSTINGS carry
+# almost no signal and are skipped.
+FUZZY_CANDIDATES = 60
+FUZZY_MAX_POSTINGS = 5000
+PREFIX_TOP_LENGTH = 3
+PREFIX_TOP_CITIES = 64
+
+
+def normalize_place_name(text):
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.lower().split())
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _max_typos(key):
+    if len(key) <= 4:
+        return 1
+    if len(key) <= 8:
+        return 2
+    return 3
+
+
+def edit_distance(a, b, limit):
+    # Optimal string alignment distance (adjacent swaps cost 1), giving up
+    # with limit + 1 as soon as every path exceeds the limit.
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class Gazetteer:
+    def __init__(self):
+        self.names = []
+        self.states = []
+        self.countries = []
+        self.lats = array("d")
+        self.lons = array("d")
+        self.populations = array("q")
+        self._match_states = []  # normalized state names, for qualifiers
+        self._match_countries = []
+        self._keys = []
+        self._key_ids = array("l")
+        self._trigram_index = {}  # trigram -> positions of distinct keys in _keys
+        self._prefix_top = {}  # short prefix -> largest matching city ids
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, state, country, lat, lon, population, aliases=()):
+        city_id = len(self.names)
+        self.names.append(name)
+        self.states.append(state)
+        self.countries.append(country)
+        self.lats.append(lat)
+        self.lons.append(lon)
+        self.populations.append(population)
+        self._match_states.append(normalize_place_name(state))
+        self._match_countries.append(country.lower())
+        for key in {normalize_place_name(n) for n in (name, *aliases) if n}:
+            self._keys.append((key, city_id))
+
+    def finalize(self):
+        self._keys.sort()
+        self._key_ids = array("l", (city_id for _, city_id in self._keys))
+        self._keys = [key for key, _ in self._keys]
+
+        postings = {}
+        for position, key in enumerate(self._keys):
+            if position and self._keys[position - 1] == key:
+                continue
+            for gram in _trigrams(key):
+                postings.setdefault(gram, []).append(position)
+        self._trigram_index = {gram: array("l", positions) for gram, positions in postings.items()}
+
+        by_prefix = {}
+        for key, city_id in zip(self._keys, self._key_ids):
+            for length in range(1, min(len(key), PREFIX_TOP_LENGTH) + 1):
+                by_prefix.setdefault(key[:length], set()).add(city_id)
+        self._prefix_top = {
+            prefix: array("l", heapq.nsmallest(PREFIX_TOP_CITIES, ids, key=lambda i: (-self.populations[i], i)))
+            for prefix, ids in by_prefix.items()
+        }
+
+    def record(self, city_id):
+        return city_record(
+            self.names[city_id],
+            self.states[city_id],
+            self.countries[city_id],
+            self.lats[city_id],
+            self.lons[city_id],
+        )
+
+    def _qualifies(self, city_id, qualifiers):
+        # "Paris, FR" / "Hyderabad, Telangana, IN": every part after the name
+        # must match the country code or the start of the state name.
+        state = self._match_states[city_id]
+        country = self._match_countries[city_id]
+        return all(q == country or (state and state.startswith(q)) for q in qualifiers)
+
+    def search(self, query, limit=8, complete=True):
+        # complete=False matches whole names only (no prefix completion).
+        parts = [normalize_place_name(p) for p in (query or "").split(",")]
+        prefix, qualifiers = parts[0], [q for q in parts[1:] if q]
+        if not prefix:
+            return []
+
+        def largest(city_ids):
+            qualified = {i for i in city_ids if self._qualifies(i, qualifiers)} if qualifiers else set(city_ids)
+            return heapq.nsmallest(limit * 4, qualified, key=lambda i: (-self.populations[i], i))
+
+        # Exact matches sort first in the prefix run and rank first.
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + "\uffff", start)
+        exact_end = start
+        while exact_end < end and self._keys[exact_end] == prefix:
+            exact_end += 1
+        exact = largest(self._key_ids[start:exact_end])
+        if not complete:
+            return self._records(exact, limit)
+
+        top = self._prefix_top.get(prefix)
+        if top is not None:
+            results = self._records(exact + [i for i in top if self._qualifies(i, qualifiers)], limit)
+            if len(results) >= limit or len(top) < PREFIX_TOP_CITIES:
+                return results
+
+        # Longer prefixes (or qualifiers filtering out the precomputed top):
+        # scan the run, keeping only the largest few cities.
+        return self._records(exact + largest(self._key_ids[exact_end:end]), limit)
+
+    def _records(self, city_ids, limit):
+        # Records for the first `limit` distinct places among ranked ids.
+        output = []
+        seen = set()
+        for city_id in city_ids:
+            if city_id in seen:
+                continue
+            seen.add(city_id)
+            record = self.record(city_id)
+            if all(r["display_name"] != record["display_name"] for r in output):
+                output.append(record)
+                if len(output) == limit:
+                    break
+        return output
+
+    def fuzzy_search(self, query, limit=8):
+        parts = [normalize_place_name(p) for p in (query or "").split(",")]
+        name, qualifiers = parts[0], [q for q in parts[1:] if q]
+        if len(name) < 3:
+            return []
+
+        overlap = Counter()
+        for gram in _trigrams(name):
+            positions = self._trigram_index.get(gram)
+            if positions is not None and len(positions) <= FUZZY_MAX_POSTINGS:
+                overlap.update(positions)
+
+        max_typos = _max_typos(name)
+        best = {}
+        for position, _ in overlap.most_common(FUZZY_CANDIDATES):
+            key = self._keys[position]
+            distance = edit_distance(name, key, max_typos)
+            if distance > max_typos:
+                continue
+            # Every city sharing this key; fewer typos first, then the larger city.
+            while position < len(self._keys) and self._keys[position] == key:
+                city_id = self._key_ids[position]
+                if self._qualifies(city_id, qualifiers):
+                    rank = (distance, -self.populations[city_id])
+                    if city_id not in best or rank < best[city_id]:
+                        best[city_id] = rank
+                position += 1
+
+        ranked = sorted(best, key=lambda city_id: best[city_id])
+        return unique_by([self.record(i) for i in ranked], lambda x: x["display_name"])[:limit]
+
+
+def load_admin1_names(path):
+    names = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) >= 2:
+                names[cols[0]] = cols[1]
+    return names
+
+
+def load_gazetteer(path, admin1_path=None, min_population=GAZETTEER_MIN_POPULATION):
+    admin1 = load_admin1_names(admin1_path) if admin1_path else {}
+    gazetteer = Gazetteer()
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 15:
+                continue
+            population = int(cols[14] or 0)
+            if population < min_population:
+                continue
+            country = cols[8]
+            gazetteer.add(
+                name=cols[1],
+                state=admin1.get(f"{country}.{cols[10]}", ""),
+                country=country,
+                lat=float(cols[4]),
+                lon=float(cols[5]),
+                population=population,
+                aliases=(cols[2],),
+            )
+    gazetteer.finalize()
+    return gazetteer
+
+
+def build_gazetteer():
+    if not GAZETTEER_PATH:
+        return None
+    try:
+        return load_gazetteer(GAZETTEER_PATH, GAZETTEER_ADMIN1_PATH or None)
+    except (OSError, ValueError):
+        return None
+
+
+gazetteer = build_gazetteer()
+
+
+def search_cities(query, limit=8, complete=True):
+    # complete=True suits autocomplete: "Bali" also offers "Balikpapan".
+    # Resolving a destination passes False so only whole names (or near
+    # typos of them) match locally and anything else goes to the geocoder.
     query = (query or "").strip()
     if not query:
         return []
 
+    # The OpenWeather geocoder is only asked about names the local gazetteer
+    # does not know, even allowing for typos.
+    if gazetteer is not None:
+        local = (
+            gazetteer.search(query, limit=limit, complete=complete)
+            or gazetteer.fuzzy_search(query, limit=limit)
+        )
+        if local:
+            return local
+
     data = safe_get_json(
         OPENWEATHER_GEO_URL,
         params={"q": query, "limit": max(limit, 1), "appid": OPENWEATHER_API_KEY},
@@ -68,23 +1366,14 @@ def search_cities(query, limit=8):
         lon = item.get("lon")
         if not city or lat is None or lon is None:
             continue
-        display_name = f"{city}, {country}" if not state else f"{city}, {state}, {country}"
-        cities.append(
-            {
-                "city": city,
-                "state": state,
-                "country": country,
-                "lat": lat,
-                "lon": lon,
-                "display_name": display_name,
-            }
-        )
+        cities.append(city_record(city, state, country, lat, lon))
 
     return unique_by(cities, lambda x: x["display_name"])[:limit]
 
 
+@traced("resolve_city")
 def resolve_city(query):
-    matches = search_cities(query, limit=1)
+    matches = search_cities(query, limit=1, complete=False)
     if matches:
         return matches[0]
 
@@ -100,6 +1389,124 @@ def resolve_city(query):
     }
 
 
+# Weather is served stale-while-revalidate. A reading younger than
+# CACHE_TTL_WEATHER is fresh. Until WEATHER_STALE_SECONDS it is returned at
+# once while a single background call refreshes it, which keeps OpenWeather
+# off the critical path for warm cities. Until WEATHER_STALE_IF_ERROR_SECONDS
+# it is refetched inline, but still preferred over invented values when
+# OpenWeather is slow or down.
+WEATHER_FRESH_SECONDS = CACHE_TTL_SECONDS["openweather_weather"]
+WEATHER_STALE_SECONDS = int(os.getenv("WEATHER_STALE_SECONDS", 3600))
+WEATHER_STALE_IF_ERROR_SECONDS = int(os.getenv("WEATHER_STALE_IF_ERROR_SECONDS", 24 * 3600))
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", 5000))
+
+
+class StaleWhileRevalidateCache:
+    def __init__(self, fresh_seconds, stale_seconds, stale_if_error_seconds, max_entries):
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = max(stale_seconds, fresh_seconds)
+        self.stale_if_error_seconds = max(stale_if_error_seconds, self.stale_seconds)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, fetched_at)
+        self._refreshing = set()
+        self.served = Counter()
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _refresh(self, key, load):
+        try:
+            value = load()
+            if value is not None:
+                self._store(key, value)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def peek(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and time.monotonic() - entry[1] < self.stale_if_error_seconds:
+            return entry[0]
+        return None
+
+    def get(self, key, load):
+        # Returns (value, source); value is None when nothing usable exists.
+        with self._lock:
+            entry = self._entries.get(key)
+            age = time.monotonic() - entry[1] if entry else None
+            refresh = (
+                entry is not None
+                and self.fresh_seconds <= age < self.stale_seconds
+                and key not in self._refreshing
+            )
+            if refresh:
+                self._refreshing.add(key)
+
+        if entry and age < self.fresh_seconds:
+            source, value = "fresh", entry[0]
+        elif entry and age < self.stale_seconds:
+            if refresh:
+                # Plain submit: the refresh must not inherit this request's budget.
+                pipeline_executor.submit(self._refresh, key, load)
+            source, value = "stale", entry[0]
+        else:
+            value = load()
+            if value is not None:
+                self._store(key, value)
+                source = "miss"
+            elif entry and age < self.stale_if_error_seconds:
+                source, value = "stale_if_error", entry[0]
+            else:
+                source = "unavailable"
+        with self._lock:
+            self.served[source] += 1
+        return value, source
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "refreshing": len(self._refreshing),
+                "served": dict(self.served),
+            }
+
+
+weather_cache = StaleWhileRevalidateCache(
+    WEATHER_FRESH_SECONDS, WEATHER_STALE_SECONDS, WEATHER_STALE_IF_ERROR_SECONDS, WEATHER_CACHE_MAX_ENTRIES
+)
+metrics.describe("travel_weather_served_total", "counter", "Weather readings by cache source (fresh, stale, miss, stale_if_error, unavailable).")
+
+
+def weather_key(lat, lon, city_name):
+    # About 1 km of rounding: nearby requests share a reading.
+    if lat is not None and lon is not None:
+        return (round(float(lat), 2), round(float(lon), 2))
+    return (city_name or "").strip().lower()
+
+
+def _load_weather(params):
+    data = safe_get_json(OPENWEATHER_WEATHER_URL, params=params)
+    if not data:
+        return None
+    main = data.get("main", {})
+    weather_list = data.get("weather", [])
+    conditions = "Clear"
+    if weather_list and isinstance(weather_list, list):
+        conditions = weather_list[0].get("description", "Clear")
+    return {
+        "temperature": round(main.get("temp", 25), 1),
+        "conditions": conditions,
+        "humidity": main.get("humidity", 60),
+    }
+
+
+@traced("weather")
 def get_weather(lat, lon, city_name):
     if lat is not None and lon is not None:
         params = {
@@ -115,23 +1522,29 @@ def get_weather(lat, lon, city_name):
             "units": "metric",
         }
 
-    data = safe_get_json(OPENWEATHER_WEATHER_URL, params=params)
-    if data:
-        main = data.get("main", {})
-        weather_list = data.get("weather", [])
-        conditions = "Clear"
-        if weather_list and isinstance(weather_list, list):
-            conditions = weather_list[0].get("description", "Clear")
-        return {
-            "temperature": round(main.get("temp", 25), 1),
-            "conditions": conditions,
-            "humidity": main.get("humidity", 60),
-        }
-
+    if CACHE_ENABLED:
+        weather, source = weather_cache.get(weather_key(lat, lon, city_name), lambda: _load_weather(params))
+    else:
+        weather = _load_weather(params)
+        source = "miss" if weather is not None else "unavailable"
+    metrics.inc("travel_weather_served_total", source=source)
+    if weather is None:
+        return fallback_weather(city_name)
+    if source == "stale_if_error":
+        # A real, if older, reading: the section is not degraded.
+        budget = current_budget.get()
+        if budget is not None:
+            budget.degraded_providers.discard("openweather_weather")
+    return dict(weather)
+
+
+def fallback_weather(city):
+    metrics.inc("travel_fallbacks_total", kind="weather")
+    rng = seeded_random("weather", city)
     return {
-        "temperature": round(random.uniform(15, 32), 1),
-        "conditions": random.choice(["Sunny", "Partly Cloudy", "Clear Sky", "Light Rain"]),
-        "humidity": random.randint(35, 85),
+        "temperature": round(rng.uniform(15, 32), 1),
+        "conditions": rng.choice(["Sunny", "Partly Cloudy", "Clear Sky", "Light Rain"]),
+        "humidity": rng.randint(35, 85),
     }
 
 
@@ -155,10 +1568,23 @@ def map_interest_to_categories(interests):
     return unique_by(selected, lambda x: x)
 
 
-def _fetch_geoapify_places(lat, lon, categories, limit=20, radius_m=7000):
+RESTAURANT_CATEGORIES = ["catering.restaurant", "catering.fast_food", "catering.cafe"]
+ATTRACTIONS_RADIUS_M = 10000
+RESTAURANTS_RADIUS_M = 8000
+GEOAPIFY_COMBINED_LIMIT = int(os.getenv("GEOAPIFY_COMBINED_LIMIT", 60))
+
+
+def _fetch_geoapify_features(lat, lon, categories, limit=20, radius_m=7000):
     if lat is None or lon is None:
         return []
 
+    # Serve from the offline POI extract when it covers this area; the live
+    # API is the fallback for places outside it.
+    if poi_index is not None:
+        local = poi_index.query(lat, lon, radius_m, categories, limit=limit)
+        if local:
+            return local
+
     params = {
         "categories": ",".join(categories),
         "filter": f"circle:{lon},{lat},{radius_m}",
@@ -174,36 +1600,243 @@ def _fetch_geoapify_places(lat, lon, categories, limit=20, radius_m=7000):
     output = []
     for feature in features:
         props = feature.get("properties", {})
-        name = (props.get("name") or "").strip()
-        if not name:
-            continue
-        category_list = props.get("categories", [])
-        category_name = category_list[0] if category_list else "Attraction"
-        output.append(
-            {
-                "name": name,
-                "categories": {"name": category_name.replace(".", " ").title()},
-                "address_line2": props.get("address_line2") or props.get("city") or "",
-                "formatted": props.get("formatted") or "",
-                "distance_m": props.get("distance", 0),
-                "place_id": props.get("place_id", ""),
-            }
-        )
+        if (props.get("name") or "").strip():
+            output.append(props)
     return output
 
 
-def get_places(lat, lon, interests=None):
-    categories = map_interest_to_categories(interests)
-    attractions = _fetch_geoapify_places(lat, lon, categories, limit=24, radius_m=10000)
-    attractions = unique_by(attractions, lambda x: x["name"])
+def _format_geoapify_place(props):
+    category_list = props.get("categories", [])
+    category_name = category_list[0] if category_list else "Attraction"
+    return {
+        "name": props["name"].strip(),
+        "categories": {"name": category_name.replace(".", " ").title()},
+        "address_line2": props.get("address_line2") or props.get("city") or "",
+        "formatted": props.get("formatted") or "",
+        "distance_m": props.get("distance", 0),
+        "place_id": props.get("place_id", ""),
+        "lat": props.get("lat"),
+        "lon": props.get("lon"),
+    }
+
+
+def _fetch_geoapify_places(lat, lon, categories, limit=20, radius_m=7000):
+    features = _fetch_geoapify_features(lat, lon, categories, limit=limit, radius_m=radius_m)
+    return [_format_geoapify_place(props) for props in features]
+
+
+def _in_categories(props, wanted):
+    # Geoapify categories are hierarchical: "catering" covers "catering.cafe".
+    for category in props.get("categories", []):
+        for w in wanted:
+            if category == w or category.startswith(w + "."):
+                return True
+    return False
+
+
+# Offline POI store. Loaded from a GeoJSON FeatureCollection (or one feature
+# per line) such as a Geoapify export or an OSM extract; OSM tags are mapped
+# onto Geoapify categories so both look the same to the rest of the code.
+POI_GEOJSON_PATH = os.getenv("POI_GEOJSON_PATH", "")
+POI_GRID_DEGREES = float(os.getenv("POI_GRID_DEGREES", 0.02))
+EARTH_RADIUS_M = 6371000
+
+OSM_TAG_CATEGORIES = {
+    ("amenity", "restaurant"): "catering.restaurant",
+    ("amenity", "fast_food"): "catering.fast_food",
+    ("amenity", "cafe"): "catering.cafe",
+    ("amenity", "marketplace"): "commercial.marketplace",
+    ("shop", "mall"): "commercial.shopping_mall",
+    ("tourism", "attraction"): "tourism.sights",
+    ("tourism", "viewpoint"): "tourism.sights",
+    ("tourism", "museum"): "entertainment.museum",
+    ("tourism", "gallery"): "entertainment.culture.gallery",
+    ("tourism", "theme_park"): "entertainment.theme_park",
+    ("tourism", "zoo"): "entertainment.zoo",
+    ("leisure", "park"): "leisure.park",
+    ("leisure", "garden"): "leisure.park.garden",
+    ("natural", "beach"): "beach",
+    ("boundary", "national_park"): "national_park",
+}
+# Any value of these OSM keys maps to the category.
+OSM_KEY_CATEGORIES = {"historic": "heritage", "natural": "natural"}
+
+
+def _osm_categories(props):
+    categories = []
+    for (key, value), category in OSM_TAG_CATEGORIES.items():
+        if props.get(key) == value:
+            categories.append(category)
+    for key, category in OSM_KEY_CATEGORIES.items():
+        if props.get(key):
+            categories.append(category)
+    return unique_by(categories, lambda x: x)
+
+
+def _feature_point(geometry):
+    coords = (geometry or {}).get("coordinates")
+    kind = (geometry or {}).get("type")
+    if kind == "Point" and coords:
+        return coords[1], coords[0]
+    # Polygons (parks, museums) are placed at the mean of their outer ring.
+    if kind == "Polygon" and coords and coords[0]:
+        ring = coords[0]
+    elif kind == "MultiPolygon" and coords and coords[0] and coords[0][0]:
+        ring = coords[0][0]
+    else:
+        return None
+    return sum(p[1] for p in ring) / len(ring), sum(p[0] for p in ring) / len(ring)
+
+
+def _poi_props(feature):
+    props = dict(feature.get("properties") or {})
+    name = (props.get("name") or "").strip()
+    if not name:
+        return None
+    if not props.get("categories"):
+        props["categories"] = _osm_categories(props)
+    if not props["categories"]:
+        return None
+    if not props.get("formatted"):
+        street = " ".join(x for x in [props.get("addr:housenumber"), props.get("addr:street")] if x)
+        props["formatted"] = ", ".join(x for x in [name, street, props.get("addr:city")] if x)
+    props.setdefault("city", props.get("addr:city") or "")
+    props.setdefault("place_id", str(feature.get("id") or props.get("@id") or props.get("osm_id") or ""))
+    return props
+
+
+def _distance_m(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class POIIndex:
+    def __init__(self, cell_degrees=POI_GRID_DEGREES):
+        self.cell = cell_degrees
+        self._grid = {}  # (row, col) -> [(lat, lon, props)]
+        self.size = 0
+
+    def _cell_of(self, lat, lon):
+        return int(math.floor(lat / self.cell)), int(math.floor(lon / self.cell))
+
+    def add(self, lat, lon, props):
+        self._grid.setdefault(self._cell_of(lat, lon), []).append((lat, lon, props))
+        self.size += 1
+
+    def query(self, lat, lon, radius_m, categories=None, limit=20):
+        lat_span = radius_m / 111320.0
+        lon_span = radius_m / (111320.0 * max(math.cos(math.radians(lat)), 0.01))
+        row_min, col_min = self._cell_of(lat - lat_span, lon - lon_span)
+        row_max, col_max = self._cell_of(lat + lat_span, lon + lon_span)
+
+        matches = []
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                for p_lat, p_lon, props in self._grid.get((row, col), ()):
+                    if categories and not _in_categories(props, categories):
+                        continue
+                    distance = _distance_m(lat, lon, p_lat, p_lon)
+                    if distance <= radius_m:
+                        matches.append((distance, p_lat, p_lon, props))
+
+        matches.sort(key=lambda m: m[0])
+        output = []
+        for distance, p_lat, p_lon, props in matches[:limit]:
+            place = dict(props)
+            place["distance"] = int(round(distance))
+            place.setdefault("lat", p_lat)
+            place.setdefault("lon", p_lon)
+            output.append(place)
+        return output
+
+
+def load_poi_index(path, cell_degrees=POI_GRID_DEGREES):
+    with open(path, encoding="utf-8") as fh:
+        text = fh.read()
+    try:
+        features = json.loads(text).get("features", [])
+    except ValueError:
+        features = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    index = POIIndex(cell_degrees)
+    for feature in features:
+        point = _feature_point(feature.get("geometry"))
+        props = _poi_props(feature)
+        if point and props:
+            index.add(point[0], point[1], props)
+    return index
+
+
+def build_poi_index():
+    if not POI_GEOJSON_PATH:
+        return None
+    try:
+        return load_poi_index(POI_GEOJSON_PATH)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+poi_index = build_poi_index()
+
+
+def partition_nearby_features(features, interest_categories):
+    attractions = [
+        _format_geoapify_place(p) for p in features if _in_categories(p, interest_categories)
+    ]
+    restaurants = [
+        _format_geoapify_place(p)
+        for p in features
+        if _in_categories(p, RESTAURANT_CATEGORIES) and p.get("distance", 0) <= RESTAURANTS_RADIUS_M
+    ]
+    return attractions, restaurants
+
+
+# One Geoapify query for the union of interest and catering categories,
+# partitioned locally into (attractions, restaurants) candidates for
+# get_places / get_restaurants.
+@traced("places")
+def fetch_nearby_places(lat, lon, interests=None):
+    interest_categories = map_interest_to_categories(interests)
+    categories = unique_by(interest_categories + RESTAURANT_CATEGORIES, lambda x: x)
+    features = _fetch_geoapify_features(
+        lat, lon, categories, limit=GEOAPIFY_COMBINED_LIMIT, radius_m=ATTRACTIONS_RADIUS_M
+    )
+    attractions, restaurants = partition_nearby_features(features, interest_categories)
+
+    # A full page means one side may have been crowded out by the other (dense
+    # restaurant districts); top that side up with its own query.
+    if len(features) >= GEOAPIFY_COMBINED_LIMIT:
+        if len(unique_by(attractions, lambda x: x["name"])) < 12:
+            attractions = _fetch_geoapify_places(
+                lat, lon, interest_categories, limit=24, radius_m=ATTRACTIONS_RADIUS_M
+            )
+        if len(unique_by(restaurants, lambda x: x["name"])) < 8:
+            restaurants = _fetch_geoapify_places(
+                lat, lon, RESTAURANT_CATEGORIES, limit=24, radius_m=RESTAURANTS_RADIUS_M
+            )
+    return attractions, restaurants
+
+
+@traced("attractions")
+def get_places(lat, lon, interests=None, candidates=None):
+    if candidates is None:
+        categories = map_interest_to_categories(interests)
+        candidates = _fetch_geoapify_places(lat, lon, categories, limit=24, radius_m=ATTRACTIONS_RADIUS_M)
+    attractions = unique_by(candidates, lambda x: x["name"])
     attractions.sort(key=lambda x: x.get("distance_m", 0))
     return attractions[:12]
 
 
-def get_restaurants(lat, lon, budget="Standard"):
-    categories = ["catering.restaurant", "catering.fast_food", "catering.cafe"]
-    restaurants = _fetch_geoapify_places(lat, lon, categories, limit=24, radius_m=8000)
-    restaurants = unique_by(restaurants, lambda x: x["name"])
+@traced("restaurants")
+def get_restaurants(lat, lon, budget="Standard", candidates=None):
+    if candidates is None:
+        candidates = _fetch_geoapify_places(
+            lat, lon, RESTAURANT_CATEGORIES, limit=24, radius_m=RESTAURANTS_RADIUS_M
+        )
+    restaurants = unique_by(candidates, lambda x: x["name"])
     restaurants.sort(key=lambda x: x.get("distance_m", 0))
 
     if budget == "Economy":
@@ -216,22 +1849,25 @@ def get_restaurants(lat, lon, budget="Standard"):
     output = []
     for r in restaurants[:8]:
         cat = r.get("categories", {}).get("name", "Restaurant")
+        rng = seeded_random(r.get("place_id") or r["name"], budget)
         output.append(
             {
                 "name": r["name"],
                 "address": r.get("formatted") or r.get("address_line2") or "",
                 "address_line2": r.get("address_line2") or "",
-                "price_range": random.choice(price_choices),
+                "price_range": rng.choice(price_choices),
                 "specialty": cat,
                 "categories": {"name": cat},
-                "rating": round(random.uniform(3.7, 4.9), 1),
+                "rating": round(rng.uniform(3.7, 4.9), 1),
+                "lat": r.get("lat"),
+                "lon": r.get("lon"),
             }
         )
     return output
 
 
 def generate_local_specialties(city, country):
-    seed_text = f"{city}-{country}".lower()
+    metrics.inc("travel_fallbacks_total", kind="local_specialties")
     pool = [
         "Street Food",
         "Local Bakery",
@@ -244,12 +1880,10 @@ def generate_local_specialties(city, country):
         "Farm-to-Table Cuisine",
         "Night Market Snacks",
     ]
-    random.seed(seed_text)
-    picks = random.sample(pool, 5)
-    random.seed()
-    return picks
+    return seeded_random(city, country).sample(pool, 5)
 
 
+@traced("food")
 def get_spoonacular_food(city, country="", number=8):
     query_parts = [city, country, "local cuisine"]
     query = " ".join([x for x in query_parts if x]).strip()
@@ -275,6 +1909,7 @@ def get_spoonacular_food(city, country="", number=8):
     return foods
 
 
+@traced("thumbnail_search")
 def get_wikipedia_thumbnail(query, size=1000):
     params = {
         "action": "query",
@@ -298,19 +1933,99 @@ def get_wikipedia_thumbnail(query, size=1000):
     return ""
 
 
-def build_location_images(city, attractions, limit=6):
+WIKIPEDIA_MAX_TITLES = 50
+
+
+@traced("thumbnail_titles")
+def _wikipedia_title_thumbnails(titles, size):
+    # Exact-title lookup, up to 50 titles per query. Follows the normalization
+    # and redirect maps MediaWiki returns so every input title maps back to
+    # the page that actually carries the image.
+    output = {}
+    for start in range(0, len(titles), WIKIPEDIA_MAX_TITLES):
+        chunk = titles[start:start + WIKIPEDIA_MAX_TITLES]
+        params = {
+            "action": "query",
+            "format": "json",
+            "titles": "|".join(chunk),
+            "redirects": 1,
+            "prop": "pageimages",
+            "piprop": "thumbnail",
+            "pithumbsize": size,
+            "pilimit": WIKIPEDIA_MAX_TITLES,
+        }
+        data = safe_get_json(WIKIPEDIA_API_URL, params=params, timeout=12)
+        if not data:
+            continue
+
+        query = data.get("query") or {}
+        aliases = {}
+        for item in (query.get("normalized") or []) + (query.get("redirects") or []):
+            aliases[item.get("from")] = item.get("to")
+        thumbs = {}
+        for page in (query.get("pages") or {}).values():
+            thumb = (page.get("thumbnail") or {}).get("source") or ""
+            if thumb:
+                thumbs[page.get("title")] = thumb
+
+        for title in chunk:
+            resolved = title
+            for _ in range(3):
+                if resolved not in aliases:
+                    break
+                resolved = aliases[resolved]
+            if thumbs.get(resolved):
+                output[title] = thumbs[resolved]
+    return output
+
+
+def _thumbnail_lookups(names, city=None):
+    names = unique_by([(n or "").strip() for n in (names or []) if (n or "").strip()], lambda x: x)
+    lookups = list(names)
+    if city and city not in lookups:
+        lookups.append(city)
+    titles = [n for n in lookups if "|" not in n]
+    return lookups, titles
+
+
+def _thumbnail_searches(lookups, found, city=None):
+    # Names that are not exact article titles still need a full-text search.
+    searches = {n: n for n in lookups if n not in found}
+    if city and city in searches:
+        searches[city] = f"{city} skyline landmark"
+    return searches
+
+
+def get_wikipedia_thumbnails(names, city=None, size=1200, fanout=None):
+    lookups, titles = _thumbnail_lookups(names, city)
+    found = _wikipedia_title_thumbnails(titles, size) if titles else {}
+
+    # The searches run concurrently as a second round.
+    searches = _thumbnail_searches(lookups, found, city)
+    if searches:
+        fanout = fanout or RequestFanout()
+        keys = list(searches)
+        results = fanout.map(lambda k: get_wikipedia_thumbnail(searches[k], size=size), keys)
+        for key, thumb in zip(keys, results):
+            if thumb:
+                found[key] = thumb
+
+    return {n: found.get(n, "") for n in lookups}
+
+
+@traced("location_images")
+def build_location_images(city, attractions, limit=6, thumbnails=None, fanout=None):
     names = [a.get("name", "").strip() for a in (attractions or []) if a.get("name")]
     queries = names[:limit]
+    if thumbnails is None:
+        thumbnails = get_wikipedia_thumbnails(queries, city=city, size=1200, fanout=fanout)
     if city:
-        queries.insert(0, f"{city} skyline landmark")
+        queries.insert(0, city)
 
-    urls = []
-    for q in queries:
-        img = get_wikipedia_thumbnail(q, size=1200)
-        if img:
-            urls.append(img)
+    urls = [thumbnails.get(q) for q in queries if thumbnails.get(q)]
 
     if not urls:
+        metrics.inc("travel_fallbacks_total", kind="location_images")
         urls = [
             "https://images.pexels.com/photos/346885/pexels-photo-346885.jpeg?auto=compress&cs=tinysrgb&w=1200",
             "https://images.pexels.com/photos/3155666/pexels-photo-3155666.jpeg?auto=compress&cs=tinysrgb&w=1200",
@@ -318,22 +2033,212 @@ def build_location_images(city, attractions, limit=6):
     return unique_by(urls, lambda x: x)[:limit]
 
 
-def generate_daily_activities(day, city, attractions, restaurants, interests):
+# Day planning. Attractions are split into one group per day by proximity
+# (k-means on a local metre grid, with days capped at similar sizes) and each
+# day's stops are ordered as a short open route: nearest neighbour, then 2-opt
+# until no reversal shortens it. Lunch is the closest unused restaurant to
+# the last morning stop that is not itself a planned stop. Seeding is
+# deterministic, so equal inputs give equal plans. Without NumPy or
+# coordinates, days take the candidates in distance order as before. Only the
+# closest days * DAY_PLAN_MAX_STOPS candidates are planned, so no day gets
+# more than that many stops.
+DAY_PLAN_MAX_ITERATIONS = 12
+DAY_PLAN_MAX_STOPS = max(1, int(os.getenv("DAY_PLAN_MAX_STOPS", 4)))
+
+
+def _place_point(place):
+    try:
+        return float(place["lat"]), float(place["lon"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _project_m(points, lat0):
+    # Equirectangular around lat0: well under 1% off at city scale.
+    radians = np.radians(np.asarray(points, dtype=float))
+    return np.column_stack((
+        EARTH_RADIUS_M * radians[:, 1] * math.cos(math.radians(lat0)),
+        EARTH_RADIUS_M * radians[:, 0],
+    ))
+
+
+def _distance_matrix(a, b):
+    return np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2))
+
+
+def _balanced_assign(dist, capacity):
+    # Each round, unassigned points claim their nearest open centre; a centre
+    # keeps its closest claimants up to capacity and closes when full.
+    labels = np.full(dist.shape[0], -1)
+    load = np.zeros(dist.shape[1], dtype=int)
+    dist = dist.copy()
+    while (labels < 0).any():
+        free = np.flatnonzero(labels < 0)
+        choice = dist[free].argmin(axis=1)
+        for centre in np.unique(choice):
+            claimants = free[choice == centre]
+            keep = claimants[np.argsort(dist[claimants, centre], kind="stable")[:capacity - load[centre]]]
+            labels[keep] = centre
+            load[centre] += len(keep)
+            if load[centre] >= capacity:
+                dist[:, centre] = np.inf
+    return labels
+
+
+def _cluster(xy, k):
+    # Farthest-point seeding rather than random k-means++ keeps plans stable.
+    nearest = ((xy - xy.mean(axis=0)) ** 2).sum(axis=1)
+    centres = []
+    for _ in range(k):
+        centres.append(xy[int(nearest.argmax())])
+        nearest = np.minimum(nearest, ((xy - centres[-1]) ** 2).sum(axis=1))
+    centres = np.array(centres)
+    capacity = -(-len(xy) // k)
+    labels = None
+    for _ in range(DAY_PLAN_MAX_ITERATIONS):
+        assigned = _balanced_assign(_distance_matrix(xy, centres), capacity)
+        if labels is not None and (assigned == labels).all():
+            break
+        labels = assigned
+        centres = np.array([
+            xy[labels == c].mean(axis=0) if (labels == c).any() else centres[c] for c in range(k)
+        ])
+    return labels
+
+
+def _route(xy):
+    n = len(xy)
+    if n < 3:
+        return list(range(n))
+    # Node n is a free endpoint at zero distance from every stop, which turns
+    # the open route into a closed tour for 2-opt.
+    dist = np.zeros((n + 1, n + 1))
+    dist[:n, :n] = _distance_matrix(xy, xy)
+    order = [int(((xy - xy.mean(axis=0)) ** 2).sum(axis=1).argmax())]
+    left = np.ones(n, dtype=bool)
+    left[order[0]] = False
+    while left.any():
+        order.append(int(np.where(left, dist[order[-1], :n], np.inf).argmin()))
+        left[order[-1]] = False
+
+    path = np.array([n] + order + [n])
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n):
+            js = np.arange(i + 1, n + 1)
+            gain = (
+                dist[path[i - 1], path[i]] + dist[path[js], path[js + 1]]
+                - dist[path[i - 1], path[js]] - dist[path[i], path[js + 1]]
+            )
+            best = int(gain.argmax())
+            if gain[best] > 1e-6:
+                path[i:js[best] + 1] = path[i:js[best] + 1][::-1].copy()
+                improved = True
+    return path[1:-1].tolist()
+
+
+def group_attractions(attractions, days):
+    if not attractions or days < 1:
+        return []
+    attractions = sorted(attractions, key=lambda a: a.get("distance_m", 0))[:days * DAY_PLAN_MAX_STOPS]
+    k = min(days, len(attractions))
+    located = [(a, _place_point(a)) for a in attractions if _place_point(a)]
+    if np is None or len(located) < k:
+        size = -(-len(attractions) // k)
+        return [attractions[i:i + size] for i in range(0, len(attractions), size)]
+
+    points = [point for _, point in located]
+    xy = _project_m(points, sum(lat for lat, _ in points) / len(points))
+    labels = _cluster(xy, k)
+    groups = []
+    for c in range(k):
+        members = np.flatnonzero(labels == c)
+        groups.append([located[members[i]][0] for i in _route(xy[members])])
+    for a in attractions:
+        if not _place_point(a):
+            min(groups, key=len).append(a)
+    groups = [g for g in groups if g]
+    # Closest neighbourhoods first, as the flat list used to be ordered.
+    groups.sort(key=lambda g: sum(a.get("distance_m", 0) for a in g) / len(g))
+    return groups
+
+
+def morning_stop_count(stops):
+    return -(-len(stops) // 2)
+
+
+def _place_keys(place):
+    return {k for k in (place.get("place_id"), (place.get("name") or "").strip().lower()) if k}
+
+
+def pick_lunch_spots(groups, restaurants):
+    # Catering places can be attractions too: lunch is never one of the day's
+    # own stops. Among the rest, the closest unused restaurant that is no
+    # other day's stop wins, then any unused one, then the closest.
+    planned = set().union(*(_place_keys(s) for g in groups for s in g))
+    used = set()
+    lunches = []
+    for group in groups:
+        own = set().union(*(_place_keys(s) for s in group))
+        candidates = [r for r in restaurants if not _place_keys(r) & own]
+        if not candidates:
+            lunches.append(None)
+            continue
+        anchor = _place_point(group[morning_stop_count(group) - 1])
+        located = [r for r in candidates if _place_point(r)]
+        if np is None or anchor is None or not located:
+            ranked = candidates
+        else:
+            xy = _project_m([anchor] + [_place_point(r) for r in located], anchor[0])
+            ranked = [located[int(i)] for i in np.argsort(_distance_matrix(xy[:1], xy[1:])[0], kind="stable")]
+        choice = (
+            next((r for r in ranked if id(r) not in used and not _place_keys(r) & planned), None)
+            or next((r for r in ranked if id(r) not in used), None)
+            or ranked[0]
+        )
+        used.add(id(choice))
+        lunches.append(choice)
+    return lunches
+
+
+def route_km(stops):
+    points = [_place_point(s) for s in stops]
+    points = [p for p in points if p]
+    return round(sum(_distance_m(*a, *b) for a, b in zip(points, points[1:])) / 1000, 2)
+
+
+def plan_days(attractions, restaurants, days):
+    # One (stops, lunch restaurant) pair per day; short lists repeat.
+    groups = group_attractions(attractions, days)
+    if not groups:
+        lunches = [restaurants[(day - 1) % len(restaurants)] if restaurants else None for day in range(1, days + 1)]
+        return [([], lunch) for lunch in lunches]
+    lunches = pick_lunch_spots(groups, restaurants)
+    return [(groups[(day - 1) % len(groups)], lunches[(day - 1) % len(groups)]) for day in range(1, days + 1)]
+
+
+def generate_daily_activities(day, city, stops, lunch_restaurant, interests):
     themes = ["Landmarks & History", "Culture & Arts", "Food & Markets", "Nature & Relaxation", "Adventure & Exploration"]
     theme = themes[(day - 1) % len(themes)]
 
-    if attractions:
-        attraction = attractions[min((day - 1) * 2, len(attractions) - 1)]
+    if stops:
+        split = morning_stop_count(stops)
+        attraction = stops[0]
         attraction_name = attraction.get("name", f"Top attraction in {city}")
         attraction_category = attraction.get("categories", {}).get("name", "attraction").lower()
         morning = f"Start your day at {attraction_name}, a must-visit {attraction_category}"
-        afternoon = f"Explore nearby highlights around {attraction_name} and enjoy local city life"
+        if split > 1:
+            morning += ", then walk on to " + ", ".join(s.get("name", "") for s in stops[1:split])
+        if stops[split:]:
+            afternoon = "Continue to " + ", ".join(s.get("name", "") for s in stops[split:]) + " and enjoy local city life"
+        else:
+            afternoon = f"Explore nearby highlights around {attraction_name} and enjoy local city life"
     else:
         morning = f"Explore the cultural center of {city} and discover iconic local spots"
         afternoon = f"Take a guided walk through neighborhoods and hidden gems in {city}"
 
-    if restaurants:
-        lunch_restaurant = restaurants[(day - 1) % len(restaurants)]
+    if lunch_restaurant:
         lunch = f"Lunch at {lunch_restaurant.get('name', 'a local restaurant')} with regional flavors"
     else:
         lunch = "Enjoy local cuisine at a highly-rated neighborhood restaurant"
@@ -351,44 +2256,405 @@ def generate_daily_activities(day, city, attractions, restaurants, interests):
         "lunch": lunch,
         "afternoon": afternoon,
         "evening": evening,
+        "stops": [{"name": s.get("name"), "lat": s.get("lat"), "lon": s.get("lon")} for s in stops],
+        "route_km": route_km(stops),
     }
 
 
+# Image proxy. Wikipedia, Spoonacular and Pexels originals are 1000-1200 px
+# wide while the frontend shows them in columns. /img fetches each source once,
+# keeps resized JPEG/WebP variants in a size-bounded directory (least recently
+# served files are pruned first) and serves them with year-long cache headers.
+# Itinerary responses point their image URLs at /img when the cache is usable.
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "travel-planner-images"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+IMAGE_PROXY_BASE_URL = os.getenv("IMAGE_PROXY_BASE_URL", "")
+IMAGE_PROXY_HOSTS = {
+    h.strip().lower()
+    for h in os.getenv(
+        "IMAGE_PROXY_HOSTS", "upload.wikimedia.org,images.pexels.com,img.spoonacular.com,spoonacular.com"
+    ).split(",")
+    if h.strip()
+}
+IMAGE_MAX_SOURCE_BYTES = int(os.getenv("IMAGE_MAX_SOURCE_BYTES", 15 * 1024 * 1024))
+IMAGE_FETCH_TIMEOUT_SECONDS = float(os.getenv("IMAGE_FETCH_TIMEOUT_SECONDS", 10))
+IMAGE_MAX_REDIRECTS = 3
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", 80))
+IMAGE_WIDTHS = {"thumb": 320, "card": 640, "hero": 1280}
+IMAGE_FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+IMAGE_MAX_AGE_SECONDS = 365 * 24 * 3600
+
+
+class ImageCache:
+    def __init__(self, directory, max_bytes=IMAGE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = sum(e.stat().st_size for e in os.scandir(directory) if e.is_file())
+
+    def get(self, key):
+        path = os.path.join(self.directory, key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # File mtime doubles as the LRU clock; refresh it coarsely.
+            now = time.time()
+            if now - os.stat(path).st_mtime > 60:
+                os.utime(path, (now, now))
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def set(self, key, data):
+        path = os.path.join(self.directory, key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+            return
+        with self._lock:
+            self._bytes += len(data)
+            over_budget = self._bytes > self.max_bytes
+        if over_budget:
+            self.prune()
+
+    def prune(self):
+        # Every worker writes to the same directory, so recount from disk and
+        # trim to 90% of the budget to avoid pruning again on the next write.
+        with self._lock:
+            files = []
+            for entry in os.scandir(self.directory):
+                with contextlib.suppress(OSError):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes * 0.9:
+                    break
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+                    total -= size
+                    self.evictions += 1
+            self._bytes = total
+
+    def stats(self):
+        with self._lock:
+            return {
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def build_image_cache():
+    if Image is None or not IMAGE_CACHE_DIR:
+        return None
+    try:
+        return ImageCache(IMAGE_CACHE_DIR)
+    except OSError:
+        return None
+
+
+image_cache = build_image_cache()
+
+
+def is_proxyable_image(url):
+    try:
+        parts = urlsplit(url or "")
+    except ValueError:
+        return False
+    return parts.scheme in {"http", "https"} and (parts.hostname or "") in IMAGE_PROXY_HOSTS
+
+
+def image_proxy_base_url():
+    # Resolved inside the request: streamed generators run without one.
+    if image_cache is None:
+        return ""
+    if IMAGE_PROXY_BASE_URL:
+        return IMAGE_PROXY_BASE_URL.rstrip("/") + "/"
+    return request.host_url
+
+
+def proxied_image_url(url, variant, base_url):
+    if not base_url or not is_proxyable_image(url):
+        return url
+    return f"{base_url}img?{urlencode({'src': url, 'w': variant})}"
+
+
+def proxy_section_images(section, base_url):
+    # Returns a copy; the pipeline keeps reusing its own attraction dicts.
+    if not base_url:
+        return section
+    section = dict(section)
+    if "attractions" in section:
+        section["attractions"] = [
+            dict(a, image=proxied_image_url(a["image"], "card", base_url)) if a.get("image") else a
+            for a in section["attractions"]
+        ]
+    if "location_images" in section:
+        section["location_images"] = [
+            proxied_image_url(url, "hero" if i == 0 else "card", base_url)
+            for i, url in enumerate(section["location_images"])
+        ]
+    if "food_images" in section:
+        section["food_images"] = [proxied_image_url(url, "card", base_url) for url in section["food_images"]]
+    return section
+
+
+def fetch_image_source(src, digest):
+    key = f"{digest}.src"
+    data = image_cache.get(key)
+    if data is not None:
+        return data
+
+    def load():
+        chunks = []
+        size = 0
+        url = src
+        try:
+            # Redirects are followed by hand so every hop is checked against
+            # the host allowlist, not just the first URL.
+            for _ in range(IMAGE_MAX_REDIRECTS + 1):
+                with upstream_session.get(
+                    url, timeout=IMAGE_FETCH_TIMEOUT_SECONDS, stream=True, allow_redirects=False
+                ) as r:
+                    if r.is_redirect:
+                        url = urljoin(url, r.headers.get("Location", ""))
+                        if not is_proxyable_image(url):
+                            return None
+                        continue
+                    if r.status_code != 200 or not r.headers.get("Content-Type", "").startswith("image/"):
+                        return None
+                    for chunk in r.iter_content(64 * 1024):
+                        size += len(chunk)
+                        if size > IMAGE_MAX_SOURCE_BYTES:
+                            return None
+                        chunks.append(chunk)
+                    break
+            else:
+                return None
+        except requests.RequestException:
+            return None
+        data = b"".join(chunks)
+        image_cache.set(key, data)
+        return data
+
+    return upstream_flights.do(key, load, IMAGE_FETCH_TIMEOUT_SECONDS + SINGLE_FLIGHT_GRACE_SECONDS, provider="images")
+
+
+def resize_image(data, width, fmt):
+    img = Image.open(io.BytesIO(data))
+    # Lets the JPEG decoder downscale while decoding.
+    img.draft("RGB", (width, 1))
+    img = img.convert("RGB")
+    if img.width > width:
+        img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+    out = io.BytesIO()
+    if fmt == "jpeg":
+        img.save(out, format="JPEG", quality=IMAGE_QUALITY, optimize=True, progressive=True)
+    else:
+        img.save(out, format="WEBP", quality=IMAGE_QUALITY, method=4)
+    return out.getvalue()
+
+
+def image_variant(src, variant, fmt):
+    digest = hashlib.sha256(src.encode("utf-8")).hexdigest()[:40]
+    key = f"{digest}-{variant}.{fmt}"
+    data = image_cache.get(key)
+    if data is not None:
+        return key, data
+
+    def build():
+        source = fetch_image_source(src, digest)
+        if source is None:
+            return None
+        try:
+            resized = resize_image(source, IMAGE_WIDTHS[variant], fmt)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+        image_cache.set(key, resized)
+        return resized
+
+    return key, upstream_flights.do(key, build, IMAGE_FETCH_TIMEOUT_SECONDS + SINGLE_FLIGHT_GRACE_SECONDS, provider="images")
+
+
+@app.route("/img", methods=["GET"])
+def image_proxy():
+    # /img?src=<upstream url>&w=thumb|card|hero; WebP when the browser lists it.
+    src = request.args.get("src", "")
+    variant = request.args.get("w", "card")
+    if variant not in IMAGE_WIDTHS or not is_proxyable_image(src):
+        return jsonify({"error": "Unsupported image source or size."}), 400
+    if image_cache is None:
+        return redirect(src)
+
+    fmt = "webp" if any(m == "image/webp" for m, q in request.accept_mimetypes if q > 0) else "jpeg"
+    key, data = image_variant(src, variant, fmt)
+    if data is None:
+        return redirect(src)
+    response = Response(data, mimetype=IMAGE_FORMATS[fmt][1])
+    response.headers["Cache-Control"] = f"public, max-age={IMAGE_MAX_AGE_SECONDS}, immutable"
+    response.vary.add("Accept")
+    response.set_etag(key)
+    return response.make_conditional(request)
+
+
+# Stage timings for every request; see SpanRecorder.
+@app.before_request
+def start_span_recorder():
+    current_spans.set(SpanRecorder())
+
+
+@app.after_request
+def add_server_timing(response):
+    # Streamed headers go out before any stage has run; streams send a
+    # "timings" event instead when asked.
+    recorder = current_spans.get()
+    if recorder is not None and not response.is_streamed:
+        response.headers["Server-Timing"] = recorder.server_timing()
+    return response
+
+
+def wants_timings(data):
+    return request.args.get("debug") in {"1", "true", "timings"} or data.get("debug") is True
+
+
+# Per-route request metrics. Latency is recorded when the server closes the
+# response, so NDJSON streams count their full duration, not the first byte.
+@app.before_request
+def start_request_metrics():
+    g.metrics_route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.metrics_started = time.monotonic()
+    metrics.inc("travel_http_in_flight", route=g.metrics_route)
+
+
+@app.after_request
+def finish_request_metrics(response):
+    route = g.get("metrics_route")
+    if route is None:
+        return response
+    started = g.metrics_started
+    status = str(response.status_code)
+
+    def record():
+        metrics.inc("travel_http_in_flight", -1, route=route)
+        metrics.inc("travel_http_requests_total", route=route, status=status)
+        metrics.observe("travel_http_request_seconds", time.monotonic() - started, route=route)
+
+    response.call_on_close(record)
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    # Cache and breaker state live in their own objects; copy it in at scrape time.
+    for provider, counts in response_cache.stats()["providers"].items():
+        metrics.set("travel_cache_hits_total", counts["hits"], provider=provider)
+        metrics.set("travel_cache_misses_total", counts["misses"], provider=provider)
+    for provider, breaker in circuit_breakers.items():
+        metrics.set("travel_circuit_breaker_open", int(breaker.state != CircuitBreaker.CLOSED), provider=provider)
+    for name, limiter in rate_limiters.items():
+        metrics.set("travel_quota_used", limiter.used_today, key=name)
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Response compression and validators. Buffered JSON responses get a strong
+# ETag from their content (suffixed per encoding, since each encoding is its
+# own representation) and are gzip/brotli compressed when the client accepts
+# it. On GET and HEAD a matching If-None-Match gets a bodyless 304 instead;
+# POST responses are tagged and compressed but never answered with 304.
+# NDJSON streams are left alone so their sections are not held back in a
+# compressor buffer.
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))
+TAGGED_METHODS = {"GET", "HEAD", "POST"}
+CONDITIONAL_METHODS = {"GET", "HEAD"}
+
+
+def negotiate_encoding(accept_encodings, size):
+    if size < COMPRESSION_MIN_BYTES:
+        return None
+    if brotli is not None and accept_encodings.quality("br") > 0:
+        return "br"
+    if accept_encodings.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def encode_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+@app.after_request
+def compress_and_tag(response):
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or response.mimetype != "application/json"
+        or request.method not in TAGGED_METHODS
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    body = response.get_data()
+    encoding = negotiate_encoding(request.accept_encodings, len(body))
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    if encoding:
+        etag = f"{etag}-{encoding}"
+    response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+
+    if request.method in CONDITIONAL_METHODS and request.if_none_match.contains(etag):
+        response.status_code = 304
+        response.set_data(b"")
+        response.headers.pop("Content-Length", None)
+        response.headers.pop("Content-Type", None)
+        return response
+
+    if encoding:
+        response.set_data(encode_body(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
 @app.route("/city-search", methods=["GET"])
 def city_search():
     query = request.args.get("q", "").strip()
     limit = int(request.args.get("limit", 8))
-    return jsonify({"query": query, "cities": search_cities(query, limit=limit)})
+    with request_budget(CITY_SEARCH_DEADLINE_SECONDS):
+        cities = search_cities(query, limit=limit)
+    return jsonify({"query": query, "cities": cities})
 
 
-@app.route("/itinerary", methods=["POST"])
-def generate_itinerary():
-    data = request.json or {}
+def parse_itinerary_request(data):
     input_city = (data.get("city", "") or "").strip()
     days = int(data.get("days", 3))
     days = max(1, min(days, 30))
     budget = data.get("budget", "Standard")
     interests = data.get("interests", ["Culture", "Food"])
+    deadline_seconds = float(data.get("deadline_seconds") or ITINERARY_DEADLINE_SECONDS)
+    deadline_seconds = max(1.0, min(deadline_seconds, ITINERARY_MAX_DEADLINE_SECONDS))
+    return input_city, days, budget, interests, deadline_seconds
 
-    resolved = resolve_city(input_city)
+
+def describe_city(input_city, resolved):
     city = resolved["city"]
     country = resolved["country"]
-    lat = resolved["lat"]
-    lon = resolved["lon"]
-
-    weather = get_weather(lat, lon, city)
-    restaurants = get_restaurants(lat, lon, budget)
-    attractions = get_places(lat, lon, interests)
-    spoonacular_food = get_spoonacular_food(city, country, number=8)
-
-    if attractions:
-        for a in attractions:
-            q = a.get("name") or city
-            a["image"] = get_wikipedia_thumbnail(q, size=1000) or "https://images.pexels.com/photos/346885/pexels-photo-346885.jpeg?auto=compress&cs=tinysrgb&w=1000"
-
-    itinerary = []
-    for day in range(1, days + 1):
-        itinerary.append(generate_daily_activities(day, city, attractions, restaurants, interests))
 
     location_bits = [city]
     if resolved.get("state"):
@@ -407,29 +2673,526 @@ def generate_itinerary():
     normalized_city = city.lower()
     normalized_display = resolved_display_name.lower()
 
-    response = {
+    return {
         "input_city": input_city or city,
         "resolved_city": city,
         "resolved_display_name": resolved_display_name,
         "city_corrected": bool(
             input_city and normalized_input not in {normalized_city, normalized_display}
         ),
-        "coordinates": {"lat": lat, "lon": lon},
+        "coordinates": {"lat": resolved["lat"], "lon": resolved["lon"]},
         "country": country,
-        "weather": weather,
         "description": description,
-        "restaurants": restaurants,
-        "attractions": attractions,
-        "itinerary": itinerary,
-        "local_specialties": [f["name"] for f in spoonacular_food[:5]] or generate_local_specialties(city, country),
-        "food_images": [f["image"] for f in spoonacular_food if f.get("image")][:8] or [
+    }
+
+
+def build_food_section(city, country, spoonacular_food):
+    food_images = [f["image"] for f in spoonacular_food if f.get("image")][:8]
+    if not food_images:
+        metrics.inc("travel_fallbacks_total", kind="food_images")
+        food_images = [
             "https://images.pexels.com/photos/1640777/pexels-photo-1640777.jpeg?auto=compress&cs=tinysrgb&w=1200",
             "https://images.pexels.com/photos/958545/pexels-photo-958545.jpeg?auto=compress&cs=tinysrgb&w=1200",
-        ],
-        "location_images": build_location_images(city, attractions, limit=8),
-        "famous_landmarks": [a.get("name") for a in attractions[:5] if a.get("name")] or [f"Popular spots in {city}"],
+        ]
+    return {
+        "local_specialties": [f["name"] for f in spoonacular_food[:5]] or generate_local_specialties(city, country),
+        "food_images": food_images,
     }
-    return jsonify(response)
+
+
+def build_images_section(city, attractions, thumbnails):
+    for a in attractions:
+        a["image"] = thumbnails.get((a.get("name") or "").strip())
+        if not a["image"]:
+            metrics.inc("travel_fallbacks_total", kind="attraction_image")
+            a["image"] = "https://images.pexels.com/photos/346885/pexels-photo-346885.jpeg?auto=compress&cs=tinysrgb&w=1000"
+    return {
+        "attractions": attractions,
+        "location_images": build_location_images(city, attractions, limit=8, thumbnails=thumbnails),
+    }
+
+
+def build_places_sections(city, days, interests, attractions, restaurants):
+    return [
+        ("restaurants", {"restaurants": restaurants}),
+        ("itinerary", {
+            "itinerary": [
+                generate_daily_activities(day, city, stops, lunch, interests)
+                for day, (stops, lunch) in enumerate(plan_days(attractions, restaurants, days), start=1)
+            ]
+        }),
+        ("attractions", {
+            "attractions": attractions,
+            "famous_landmarks": [a.get("name") for a in attractions[:5] if a.get("name")] or [f"Popular spots in {city}"],
+        }),
+    ]
+
+
+# Sections that fall back to defaults when a provider runs out of budget.
+SECTIONS_BY_PROVIDER = {
+    "openweather_geo": ["city"],
+    "openweather_weather": ["weather"],
+    "geoapify": ["restaurants", "itinerary", "attractions"],
+    "spoonacular": ["food"],
+    "wikipedia": ["images"],
+}
+SECTIONS_BY_STAGE = {
+    "weather": ["weather"],
+    "places": ["restaurants", "itinerary", "attractions", "images"],
+    "food": ["food"],
+    "thumbnail_titles": ["images"],
+    "thumbnail_search": ["images"],
+}
+DEADLINE_GRACE_SECONDS = 0.25
+
+
+# Yields (section, partial response) pairs as soon as each section is ready.
+# Merging every partial in order gives the full /itinerary response; the
+# "images" section re-sends attractions with their thumbnails attached. Stages
+# still running when the deadline passes are answered with their defaults and
+# listed in the closing "degraded" section.
+def itinerary_events(input_city, days, budget, interests, deadline_seconds=ITINERARY_DEADLINE_SECONDS):
+    with request_budget(deadline_seconds) as request_deadline:
+        resolved = resolve_city(input_city)
+        city = resolved["city"]
+        country = resolved["country"]
+        lat = resolved["lat"]
+        lon = resolved["lon"]
+        yield "city", describe_city(input_city, resolved)
+
+        fanout = RequestFanout()
+        pending = {
+            fanout.submit(get_weather, lat, lon, city): "weather",
+            fanout.submit(fetch_nearby_places, lat, lon, interests): "places",
+            fanout.submit(get_spoonacular_food, city, country, number=8): "food",
+        }
+        attractions = []
+        lookups = []
+        thumbnails = {}
+        thumbnail_searches = 0
+        degraded = set()
+
+        while pending:
+            done, _ = wait(
+                pending,
+                timeout=request_deadline.remaining() + DEADLINE_GRACE_SECONDS,
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                break
+            for future in done:
+                stage = pending.pop(future)
+                if stage == "weather":
+                    yield "weather", {"weather": future.result()}
+                elif stage == "food":
+                    yield "food", build_food_section(city, country, future.result())
+                elif stage == "places":
+                    attraction_candidates, restaurant_candidates = future.result()
+                    attractions = get_places(lat, lon, interests, candidates=attraction_candidates)
+                    restaurants = get_restaurants(lat, lon, budget, candidates=restaurant_candidates)
+                    yield from build_places_sections(city, days, interests, attractions, restaurants)
+                    # One batched Wikipedia lookup covers both the attraction
+                    # cards and the location gallery.
+                    lookups, titles = _thumbnail_lookups([a.get("name") for a in attractions], city)
+                    pending[fanout.submit(_wikipedia_title_thumbnails, titles, 1200)] = "thumbnail_titles"
+                elif stage == "thumbnail_titles":
+                    thumbnails.update(future.result())
+                    for key, query in _thumbnail_searches(lookups, thumbnails, city).items():
+                        pending[fanout.submit(get_wikipedia_thumbnail, query, size=1200)] = ("thumbnail_search", key)
+                        thumbnail_searches += 1
+                    if thumbnail_searches == 0:
+                        yield "images", build_images_section(city, attractions, thumbnails)
+                else:
+                    thumbnails[stage[1]] = future.result() or ""
+                    thumbnail_searches -= 1
+                    if thumbnail_searches == 0:
+                        yield "images", build_images_section(city, attractions, thumbnails)
+
+        # Budget spent: answer whatever is still outstanding with defaults.
+        stages = {stage if isinstance(stage, str) else stage[0] for stage in pending.values()}
+        for stage in stages:
+            degraded.update(SECTIONS_BY_STAGE[stage])
+        stale_weather = None
+        if "weather" in stages:
+            stale_weather = weather_cache.peek(weather_key(lat, lon, city))
+            yield "weather", {"weather": dict(stale_weather) if stale_weather else fallback_weather(city)}
+        if "food" in stages:
+            yield "food", build_food_section(city, country, [])
+        if "places" in stages:
+            yield from build_places_sections(city, days, interests, [], [])
+        if stages & {"places", "thumbnail_titles", "thumbnail_search"}:
+            yield "images", build_images_section(city, attractions, thumbnails)
+
+        for provider in request_deadline.degraded_providers:
+            degraded.update(SECTIONS_BY_PROVIDER.get(provider, []))
+        if stale_weather:
+            degraded.discard("weather")
+        yield "degraded", {"degraded": sorted(degraded)}
+
+
+@app.route("/itinerary", methods=["POST"])
+def generate_itinerary():
+    data = request.json or {}
+    params = parse_itinerary_request(data)
+    destination_stats.record(params[0])
+    response = {}
+    for _, section in itinerary_events(*params):
+        response.update(section)
+    if wants_timings(data):
+        response["timings"] = current_spans.get().report()
+    return jsonify(proxy_section_images(response, image_proxy_base_url()))
+
+
+@app.route("/itinerary/stream", methods=["POST"])
+def stream_itinerary():
+    # Same pipeline as /itinerary, sent as NDJSON: one {"event", "data"} line
+    # per section, then {"event": "done"}.
+    data = request.json or {}
+    params = parse_itinerary_request(data)
+    destination_stats.record(params[0])
+    base_url = image_proxy_base_url()
+    recorder = current_spans.get()
+    timings = wants_timings(data)
+
+    def generate():
+        # The body is produced after the view returns; keep tracing into
+        # this request's recorder.
+        current_spans.set(recorder)
+        try:
+            for event, section in itinerary_events(*params):
+                yield json.dumps({"event": event, "data": proxy_section_images(section, base_url)}) + "\n"
+        except Exception as exc:
+            yield json.dumps({"event": "error", "message": str(exc)}) + "\n"
+            return
+        if timings:
+            yield json.dumps({"event": "timings", "data": {"timings": recorder.report()}}) + "\n"
+        yield json.dumps({"event": "done"}) + "\n"
+
+    return Response(
+        generate(),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Bulk planning. Trips are grouped by resolved city; each city's weather,
+# places, food and images are fetched once (places for the union of every
+# variant's interests) and every variant is assembled from them. Resolutions
+# and city groups run on their own small executors (not the pipeline pool, so
+# their upstream calls can still use RequestFanout), separate from each other
+# so a queue of pending resolves never holds up a city that is ready to build. Invalid trips are reported by
+# index and do not affect the rest.
+BULK_MAX_TRIPS = int(os.getenv("BULK_MAX_TRIPS", 500))
+BULK_CITY_CONCURRENCY = int(os.getenv("BULK_CITY_CONCURRENCY", 4))
+BULK_RESOLVE_CONCURRENCY = int(os.getenv("BULK_RESOLVE_CONCURRENCY", 4))
+BULK_GEOAPIFY_LIMIT = int(os.getenv("BULK_GEOAPIFY_LIMIT", 100))
+
+bulk_executor = ThreadPoolExecutor(max_workers=BULK_CITY_CONCURRENCY, thread_name_prefix="bulk")
+bulk_resolve_executor = ThreadPoolExecutor(max_workers=BULK_RESOLVE_CONCURRENCY, thread_name_prefix="bulk-resolve")
+
+
+def parse_bulk_trip(trip):
+    # (params, None) for a usable trip, (None, message) otherwise.
+    if not isinstance(trip, dict):
+        return None, "Trip must be an object."
+    try:
+        params = parse_itinerary_request(trip)
+    except (TypeError, ValueError):
+        return None, "Trip has an invalid days or deadline_seconds value."
+    if not params[0]:
+        return None, "Trip needs a city."
+    return params, None
+
+
+def resolve_bulk_city(input_city):
+    with batch_lane():
+        return resolve_city(input_city)
+
+
+def build_city_itineraries(resolved, trips):
+    # trips: [(index, (input_city, days, budget, interests, deadline_seconds))]
+    city = resolved["city"]
+    country = resolved["country"]
+    lat = resolved["lat"]
+    lon = resolved["lon"]
+    deadline_seconds = max(params[4] for _, params in trips)
+
+    with batch_lane(), request_budget(deadline_seconds) as city_budget:
+        fanout = RequestFanout()
+        interest_categories = {
+            index: map_interest_to_categories(params[3]) for index, params in trips
+        }
+        all_categories = unique_by(
+            [c for cats in interest_categories.values() for c in cats] + RESTAURANT_CATEGORIES,
+            lambda x: x,
+        )
+        weather_future = fanout.submit(get_weather, lat, lon, city)
+        food_future = fanout.submit(get_spoonacular_food, city, country, number=8)
+        features = _fetch_geoapify_features(
+            lat, lon, all_categories, limit=BULK_GEOAPIFY_LIMIT, radius_m=ATTRACTIONS_RADIUS_M
+        )
+
+        variants = {}
+        for index, (input_city, days, budget, interests, _) in trips:
+            attraction_candidates, restaurant_candidates = partition_nearby_features(
+                features, interest_categories[index]
+            )
+            variants[index] = (
+                get_places(lat, lon, interests, candidates=attraction_candidates),
+                get_restaurants(lat, lon, budget, candidates=restaurant_candidates),
+            )
+
+        names = [a.get("name") for attractions, _ in variants.values() for a in attractions]
+        thumbnails = get_wikipedia_thumbnails(names, city=city, size=1200, fanout=fanout)
+        weather = weather_future.result()
+        food_section = build_food_section(city, country, food_future.result())
+
+        degraded = set()
+        for provider in city_budget.degraded_providers:
+            degraded.update(SECTIONS_BY_PROVIDER.get(provider, []))
+
+    results = []
+    for index, (input_city, days, budget, interests, _) in trips:
+        attractions, restaurants = variants[index]
+        response = describe_city(input_city, resolved)
+        response["weather"] = weather
+        response.update(food_section)
+        for _, section in build_places_sections(city, days, interests, attractions, restaurants):
+            response.update(section)
+        response.update(build_images_section(city, attractions, thumbnails))
+        response["degraded"] = sorted(degraded)
+        results.append((index, response))
+    return results
+
+
+@app.route("/itineraries", methods=["POST"])
+def generate_itineraries():
+    # Body: {"trips": [<same fields as /itinerary>, ...]} or a bare list.
+    # Response: NDJSON, one {"event": "itinerary", "index", "data"} line per
+    # trip in completion order, then {"event": "done"}.
+    body = request.json or {}
+    trips = body.get("trips", []) if isinstance(body, dict) else body
+    if not isinstance(trips, list) or not trips:
+        return jsonify({"error": "Expected a non-empty list of trips."}), 400
+    if len(trips) > BULK_MAX_TRIPS:
+        return jsonify({"error": f"At most {BULK_MAX_TRIPS} trips per request."}), 400
+    trips_by_input = {}
+    invalid = []
+    for index, trip in enumerate(trips):
+        params, message = parse_bulk_trip(trip)
+        if params is None:
+            invalid.append((index, message))
+        else:
+            trips_by_input.setdefault(params[0].lower(), []).append((index, params))
+    base_url = image_proxy_base_url()
+
+    def generate():
+        for index, message in invalid:
+            yield json.dumps({"event": "error", "index": index, "message": message}) + "\n"
+
+        pending = {
+            bulk_resolve_executor.submit(resolve_bulk_city, city_trips[0][1][0]): ("resolve", city_trips)
+            for city_trips in trips_by_input.values()
+        }
+        builds = {}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, city_trips = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    for index, _ in city_trips:
+                        yield json.dumps({"event": "error", "index": index, "message": str(exc)}) + "\n"
+                    continue
+                if stage == "resolve":
+                    # Inputs naming the same city share a build unless it
+                    # has already started.
+                    previous = builds.get(result["display_name"])
+                    if previous is not None and previous.cancel():
+                        city_trips = pending.pop(previous)[1] + city_trips
+                    build = bulk_executor.submit(build_city_itineraries, result, city_trips)
+                    builds[result["display_name"]] = build
+                    pending[build] = ("build", city_trips)
+                    continue
+                for index, itinerary in result:
+                    data = proxy_section_images(itinerary, base_url)
+                    yield json.dumps({"event": "itinerary", "index": index, "data": data}) + "\n"
+        yield json.dumps({"event": "done"}) + "\n"
+
+    return Response(
+        generate(),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Cache pre-warming. /itinerary and /itinerary/stream count their destinations
+# per day (in the disk cache when configured, so counts survive deploys and
+# are shared with the CLI). A warm-up resolves each destination and fetches
+# its places, food and Wikipedia thumbnails exactly as an itinerary would, so
+# the same cache entries are filled; weather is skipped as it expires in
+# minutes. Cities are warmed one at a time with a pause in between and two
+# upstream calls at most, leaving the provider quotas to interactive traffic.
+#
+#   python travel_itinerary1.py prewarm "Paris, FR" --file cities.txt --top 20
+#
+# In the app, PREWARM_ON_START / PREWARM_EVERY_SECONDS run the same job in a
+# background thread of one gunicorn worker (elected with a lock file).
+PREWARM_DESTINATIONS = [d.strip() for d in os.getenv("PREWARM_DESTINATIONS", "").split(";") if d.strip()]
+PREWARM_TOP_N = int(os.getenv("PREWARM_TOP_N", 20))
+PREWARM_WINDOW_DAYS = int(os.getenv("PREWARM_WINDOW_DAYS", 7))
+PREWARM_INTERESTS = [i.strip() for i in os.getenv("PREWARM_INTERESTS", "Culture,Food").split(",") if i.strip()]
+PREWARM_ON_START = os.getenv("PREWARM_ON_START", "false").lower() == "true"
+PREWARM_EVERY_SECONDS = int(os.getenv("PREWARM_EVERY_SECONDS", 0))
+PREWARM_START_DELAY_SECONDS = float(os.getenv("PREWARM_START_DELAY_SECONDS", 10))
+PREWARM_PAUSE_SECONDS = float(os.getenv("PREWARM_PAUSE_SECONDS", 2))
+PREWARM_DEADLINE_SECONDS = float(os.getenv("PREWARM_DEADLINE_SECONDS", 30))
+PREWARM_CONCURRENCY = 2
+PREWARM_LOCK_PATH = os.getenv("PREWARM_LOCK_PATH", os.path.join(tempfile.gettempdir(), "travel-planner-prewarm.lock"))
+
+
+class DestinationStats:
+    def __init__(self, disk=None, window_days=PREWARM_WINDOW_DAYS):
+        self.disk = disk
+        self.window_days = window_days
+        self._lock = threading.Lock()
+        self._days = {}
+
+    def record(self, name):
+        name = (name or "").strip()
+        if not name:
+            return
+        day = int(time.time() // 86400)
+        if self.disk:
+            self.disk.count_destination(name, day)
+            return
+        with self._lock:
+            self._days.setdefault(day, Counter())[name] += 1
+            for old in [d for d in self._days if d <= day - self.window_days]:
+                del self._days[old]
+
+    def top(self, limit):
+        since_day = int(time.time() // 86400) - self.window_days + 1
+        if self.disk:
+            return self.disk.top_destinations(since_day, limit)
+        totals = Counter()
+        with self._lock:
+            for day, counts in self._days.items():
+                if day >= since_day:
+                    totals.update(counts)
+        return [name for name, _ in totals.most_common(limit)]
+
+
+destination_stats = DestinationStats(disk_cache)
+
+
+def prewarm_city(name, interests=None):
+    interests = interests or PREWARM_INTERESTS
+    with batch_lane(), request_budget(PREWARM_DEADLINE_SECONDS):
+        resolved = resolve_city(name)
+        if resolved["lat"] is None:
+            return False
+        city = resolved["city"]
+        lat = resolved["lat"]
+        lon = resolved["lon"]
+        fanout = RequestFanout(limit=PREWARM_CONCURRENCY)
+        food_future = fanout.submit(get_spoonacular_food, city, resolved["country"], number=8)
+        attraction_candidates, _ = fetch_nearby_places(lat, lon, interests)
+        attractions = get_places(lat, lon, interests, candidates=attraction_candidates)
+        get_wikipedia_thumbnails([a.get("name") for a in attractions], city=city, size=1200, fanout=fanout)
+        food_future.result()
+    return True
+
+
+def prewarm_targets(extra=(), top=PREWARM_TOP_N):
+    names = list(extra) + PREWARM_DESTINATIONS + destination_stats.top(top)
+    return unique_by([n.strip() for n in names if n and n.strip()], lambda n: n.lower())
+
+
+def prewarm_destinations(names, pause=PREWARM_PAUSE_SECONDS, report=None):
+    warmed = 0
+    for i, name in enumerate(names):
+        if i and pause > 0:
+            time.sleep(pause)
+        started = time.monotonic()
+        try:
+            ok = prewarm_city(name)
+        except Exception:
+            ok = False
+        warmed += ok
+        if report:
+            report(name, ok, time.monotonic() - started)
+    return warmed
+
+
+_prewarm_lock_file = None
+
+
+def _hold_prewarm_lock():
+    # One warmer per host: the first worker to take the lock keeps it for
+    # its lifetime; if it exits, the next cycle of another worker takes over.
+    global _prewarm_lock_file
+    if fcntl is None or _prewarm_lock_file is not None:
+        return True
+    handle = open(PREWARM_LOCK_PATH, "a")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _prewarm_lock_file = handle
+    return True
+
+
+def prewarm_loop():
+    time.sleep(PREWARM_START_DELAY_SECONDS)
+    while True:
+        if _hold_prewarm_lock():
+            prewarm_destinations(prewarm_targets())
+        if PREWARM_EVERY_SECONDS <= 0:
+            return
+        time.sleep(PREWARM_EVERY_SECONDS)
+
+
+_prewarm_started = threading.Event()
+_prewarm_start_lock = threading.Lock()
+
+
+@app.before_request
+def start_prewarm_scheduler():
+    # Started from the first request rather than at import so that neither
+    # the gunicorn master nor the prewarm CLI runs it.
+    if _prewarm_started.is_set() or not (PREWARM_ON_START or PREWARM_EVERY_SECONDS > 0):
+        return
+    with _prewarm_start_lock:
+        if not _prewarm_started.is_set():
+            _prewarm_started.set()
+            threading.Thread(target=prewarm_loop, name="prewarm", daemon=True).start()
+
+
+def prewarm_cli(argv):
+    parser = argparse.ArgumentParser(prog="travel_itinerary1.py prewarm", description="Pre-warm upstream caches for destinations.")
+    parser.add_argument("cities", nargs="*", help="destinations, as users type them")
+    parser.add_argument("--file", help="file with one destination per line")
+    parser.add_argument("--top", type=int, default=PREWARM_TOP_N, help="also warm the N most requested recent destinations")
+    parser.add_argument("--pause", type=float, default=PREWARM_PAUSE_SECONDS, help="seconds between destinations")
+    args = parser.parse_args(argv)
+
+    if disk_cache is None:
+        print("CACHE_DB_PATH is not set: results only warm this process's memory cache.", file=sys.stderr)
+    names = list(args.cities)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            names.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    targets = prewarm_targets(names, top=args.top)
+
+    def report(name, ok, seconds):
+        print(f"{'warmed' if ok else 'failed'} {name} ({seconds:.1f}s)")
+
+    warmed = prewarm_destinations(targets, pause=args.pause, report=report)
+    print(f"{warmed}/{len(targets)} destinations warmed")
+    return 0 if warmed == len(targets) else 1
 
 
 @app.route("/test", methods=["GET"])
@@ -439,7 +3202,22 @@ def test():
 
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"status": "healthy"})
+    cache_stats = response_cache.stats()
+    if disk_cache:
+        cache_stats["disk"] = disk_cache.stats()
+    return jsonify(
+        {
+            "status": "healthy",
+            "cache": cache_stats,
+            "single_flight": upstream_flights.stats(),
+            "circuit_breakers": {name: b.snapshot() for name, b in circuit_breakers.items()},
+            "poi_index": {"places": poi_index.size if poi_index else 0},
+            "gazetteer": {"cities": len(gazetteer) if gazetteer else 0},
+            "image_cache": image_cache.stats() if image_cache else None,
+            "weather_cache": weather_cache.stats(),
+            "rate_limits": {name: limiter.snapshot() for name, limiter in rate_limiters.items()},
+        }
+    )
 
 
 @app.route("/cities", methods=["GET"])
@@ -448,5 +3226,7 @@ def cities_help():
 
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["prewarm"]:
+        sys.exit(prewarm_cli(sys.argv[2:]))
     # Keep reloader off to avoid Windows watchdog race conditions and noisy restarts.
     app.run(debug=False, use_reloader=False, port=5000, host="0.0.0.0")